@@ -1,10 +1,21 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Generic, List, Optional, Sequence, Tuple, TypeVar
 from fastapi import APIRouter, Depends, status, Query, HTTPException
-from fastapi_pagination import paginate, Page, Params, add_pagination
+from fastapi_pagination import Page, Params, add_pagination
+from fastapi_pagination.ext.sqlalchemy import paginate as sqlalchemy_paginate
+from pydantic import BaseModel
+from sqlalchemy import DateTime, Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
+from sqlalchemy.sql.elements import ColumnElement
 from app.admin.schemas import UserFilter
 from app.dao.dependencies import get_current_admin_user, get_current_user
 from app.database import async_session_maker
+from app.exceptions import InvalidPaginationCursor
 from fastapi_versioning import version
 from fastapi_filter import FilterDepends
 from app.users.models import Users
@@ -29,9 +40,96 @@ class CustomParams(Params):
     size: int = DEFAULT_PAGE_SIZE
     max_size: int = MAX_PAGE_SIZE
 
+
+T = TypeVar("T")
+
+
+class KeysetPage(BaseModel, Generic[T]):
+    """Страница курсорной (keyset) пагинации"""
+    items: List[T]
+    size: int
+    next_cursor: Optional[str] = None
+
+
+def encode_cursor(scope: str, values: Sequence[Any]) -> str:
+    """Непрозрачный курсор: base64 от JSON с ключом сортировки последней строки"""
+    payload = {
+        "s": scope,
+        "k": [value.isoformat() if isinstance(value, datetime) else value for value in values],
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, scope: str, order_by: Sequence[ColumnElement]) -> List[Any]:
+    """Разбор курсора с проверкой, что он выдан для той же сортировки"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = payload["k"]
+        if payload["s"] != scope or len(values) != len(order_by):
+            raise InvalidPaginationCursor
+        return [
+            datetime.fromisoformat(value) if isinstance(column.type, DateTime) and value is not None else value
+            for column, value in zip(order_by, values)
+        ]
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+        raise InvalidPaginationCursor
+
+
+async def keyset_paginate(
+        session: AsyncSession,
+        stmt: Select,
+        order_by: Sequence[ColumnElement],
+        cursor: Optional[str],
+        size: int,
+        scope: str,
+        descending: bool = False,
+) -> Tuple[List[Any], Optional[str]]:
+    """Выборка страницы поиском по ключу сортировки вместо OFFSET.
+
+    Стоимость страницы не зависит от её глубины, если по order_by есть индекс.
+    Возвращает строки без служебных колонок ключа и курсор следующей страницы.
+    """
+    key = tuple_(*order_by)
+    if cursor:
+        last_values = tuple_(*decode_cursor(cursor, scope, order_by))
+        stmt = stmt.where(key < last_values if descending else key > last_values)
+
+    stmt = (
+        stmt.add_columns(*[column.label(f"keyset_{index}") for index, column in enumerate(order_by)])
+        .order_by(*[column.desc() if descending else column.asc() for column in order_by])
+        .limit(size + 1)
+    )
+
+    result = await session.execute(stmt)
+    rows = result.all()
+
+    key_length = len(order_by)
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor(scope, rows[-1][-key_length:])
+
+    return [tuple(row[:-key_length]) for row in rows], next_cursor
+
 add_pagination(router_pagination)
 
 
+def build_user_responses(users: Sequence[Users]) -> List[AllUserResponse]:
+    """Ответы по пользователям страницы; роли загружены selectinload только для них"""
+    return [
+        AllUserResponse(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            firstname=user.firstname,
+            roles=[role.name for role in user.roles],
+        )
+        for user in users
+    ]
+
+
 @router_pagination.get("/all-users",
                        status_code=status.HTTP_200_OK,
                        response_model=Page[AllUserResponse],
@@ -44,26 +142,38 @@ async def get_all_users(
     """Получение всех пользователей. С пагинацией. Доступно только администраторам."""
     try:
         async with async_session_maker() as session:
-            stmt = select(Users).options(selectinload(Users.roles))
-            result = await session.execute(stmt)
-            users_all = result.scalars().all()
-
-        user_responses = [
-            AllUserResponse(
-                id=user.id,
-                username=user.username,
-                email=user.email,
-                firstname=user.firstname,
-                roles=[role.name for role in user.roles],
-            )
-            for user in users_all
-        ]
-
-        return paginate(user_responses, params=params)
+            stmt = select(Users).options(selectinload(Users.roles)).order_by(Users.id)
+            return await sqlalchemy_paginate(session, stmt, params, transformer=build_user_responses)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
+@router_pagination.get("/cursor-users",
+                       status_code=status.HTTP_200_OK,
+                       response_model=KeysetPage[AllUserResponse],
+                       summary="Отображение пользователей с курсорной пагинацией")
+@version(1)
+async def get_users_by_cursor(
+        current_user: Users = Depends(get_current_admin_user),
+        cursor: Optional[str] = None,
+        size: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Получение пользователей для бесконечной прокрутки. Курсор следующей страницы - next_cursor."""
+    async with async_session_maker() as session:
+        rows, next_cursor = await keyset_paginate(
+            session,
+            select(Users).options(selectinload(Users.roles)),
+            order_by=[Users.id],
+            cursor=cursor,
+            size=size,
+            scope="users:id",
+        )
+
+    items = build_user_responses([user for (user,) in rows])
+
+    return KeysetPage[AllUserResponse](items=items, size=size, next_cursor=next_cursor)
+
+
 @router_filter.get("/users", response_model=Page[AllUserResponse], summary="Фильтрация пользователей")
 @version(1)
 async def get_filtered_users(
@@ -76,9 +186,11 @@ async def get_filtered_users(
     async with async_session_maker() as session:
         query = select(Users).options(selectinload(Users.roles))
 
-        filtered_query = user_filter.apply_filter(query)
-
-        result = await session.execute(filtered_query)
-        users_all = result.scalars().all()
+        filtered_query = user_filter.apply_filter(query).order_by(Users.id)
 
-        return paginate(users_all, Params(page=page, size=size))
+        return await sqlalchemy_paginate(
+            session,
+            filtered_query,
+            Params(page=page, size=size),
+            transformer=build_user_responses,
+        )
@@ -1,8 +1,11 @@
 from typing import Optional, List
 from fastapi import APIRouter, status, Depends, Body
 from fastapi_versioning import version
-from app.auth.auth import get_password_hash, pwd_context
+from app.auth.auth import get_password_hash
+from app.auth.password_hashing import password_hasher
+from app.dao.base import unit_of_work
 from app.dao.dao import UsersDAO, UsersRolesDAO
+from app.database import get_pool_stats
 from app.dao.dependencies import get_current_admin_user
 from app.exceptions import UserEmailAlreadyExistsException, UserNameAlreadyExistsException, UserCreated, \
     DeleteUser, UserNotFoundException, ErrorUpdatingUser
@@ -25,7 +28,7 @@ async def register_user(user_data: SUserAuth):
 
     existing_user = await users_dao.find_by_username_or_email(
         username=user_data.username,
-        email=user_data.email
+        email=user_data.email,
     )
 
     if existing_user:
@@ -34,17 +37,21 @@ async def register_user(user_data: SUserAuth):
         if existing_user.email == user_data.email:
             raise UserEmailAlreadyExistsException
 
-    hashed_password = get_password_hash(user_data.password)
+    # Хеширование только для нового пользователя и вне транзакции;
+    # одновременную регистрацию с теми же данными отсекут уникальные ограничения
+    hashed_password = await get_password_hash(user_data.password)
 
-    new_user = await users_dao.add(
-        username=user_data.username,
-        firstname=user_data.firstname,
-        email=user_data.email,
-        hashed_password=hashed_password,
-    )
+    async with unit_of_work() as session:
+        new_user = await users_dao.add(
+            username=user_data.username,
+            firstname=user_data.firstname,
+            email=user_data.email,
+            hashed_password=hashed_password,
+            session=session,
+        )
 
-    if new_user:
-        await users_roles_dao.add(user_id=new_user.id, role_name="user")
+        if new_user:
+            await users_roles_dao.add(user_id=new_user.id, role_name="user", session=session)
 
     raise UserCreated
 
@@ -59,37 +66,12 @@ async def update_user(
         firstname: str = Body(None, description="Новое имя пользователя"),
         update_roles: Optional[List[str]] = Body(None, description="Список новых ролей для пользователя"),
 ):
-    """Обновление информации о пользователе и его ролей"""
+    """Обновление информации о пользователе и его ролей одной транзакцией"""
     users_dao = UsersDAO()
     users_roles_dao = UsersRolesDAO()
 
-    user_to_update = await users_dao.find_one_or_none(id=user_id)
-    if not user_to_update:
-        raise UserNotFoundException
-
-    if username:
-        existing_user = await users_dao.find_one_or_none(username=username)
-        if existing_user and existing_user.id != user_to_update.id:
-            raise UserNameAlreadyExistsException
-
-    if email:
-        existing_user = await users_dao.find_one_or_none(email=email)
-        if existing_user and existing_user.id != user_to_update.id:
-            raise UserEmailAlreadyExistsException
-
-    hashed_password = pwd_context.hash(password) if password else None
-
-    try:
-        await users_dao.update(
-            model_id=user_to_update.id,
-            username=username,
-            email=email,
-            hashed_password=hashed_password,
-            firstname=firstname,
-        )
-    except Exception as e:
-        logger.warning(f"Ошибка при обновлении пользователя: {e}")
-        raise ErrorUpdatingUser
+    # Хеширование выполняется до открытия транзакции, чтобы не держать соединение
+    hashed_password = await get_password_hash(password) if password else None
 
     if update_roles is not None:
         update_roles = [role for role in update_roles if role]
@@ -97,10 +79,38 @@ async def update_user(
     if not update_roles:
         update_roles = ['user']
 
-    await users_roles_dao.clear_roles(user_id)
-    await users_roles_dao.add_roles(user_id, role_names=update_roles)
+    async with unit_of_work() as session:
+        user_to_update = await users_dao.find_one_or_none(id=user_id, session=session)
+        if not user_to_update:
+            raise UserNotFoundException
+
+        if username:
+            existing_user = await users_dao.find_one_or_none(username=username, session=session)
+            if existing_user and existing_user.id != user_to_update.id:
+                raise UserNameAlreadyExistsException
+
+        if email:
+            existing_user = await users_dao.find_one_or_none(email=email, session=session)
+            if existing_user and existing_user.id != user_to_update.id:
+                raise UserEmailAlreadyExistsException
+
+        try:
+            await users_dao.update(
+                model_id=user_to_update.id,
+                username=username,
+                email=email,
+                hashed_password=hashed_password,
+                firstname=firstname,
+                session=session,
+            )
+        except Exception as e:
+            logger.warning(f"Ошибка при обновлении пользователя: {e}")
+            raise ErrorUpdatingUser
+
+        await users_roles_dao.clear_roles(user_id, session=session)
+        await users_roles_dao.add_roles(user_id, role_names=update_roles, session=session)
 
-    return await users_dao.get_user_with_roles(user_id)
+        return await users_dao.get_user_with_roles(user_id, session=session)
 
 
 @router_admin.post("/delete", status_code=status.HTTP_200_OK, summary="Удаление пользователя по id")
@@ -113,3 +123,18 @@ async def delete_user(user_request: UserIdRequest):
 
 
 
+
+
+@router_admin.get("/password-hashing-stats", status_code=status.HTTP_200_OK,
+                  summary="Состояние пула хеширования паролей")
+@version(1)
+async def get_password_hashing_stats():
+    """Загрузка пула bcrypt: выполняемые и ожидающие операции, отказы, время ожидания"""
+    return password_hasher.stats()
+
+
+@router_admin.get("/db-pool-stats", status_code=status.HTTP_200_OK, summary="Состояние пула соединений с БД")
+@version(1)
+async def get_db_pool_stats():
+    """Размер пула, выданные и свободные соединения, соединения сверх пула в текущем воркере"""
+    return get_pool_stats()
@@ -0,0 +1,236 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DataError, IntegrityError
+from app.analytics.models import Analytics, Yekaterinburg_tz
+from app.analytics.partitions import analytics_partition_maintainer
+from app.analytics.rollups import upsert_rollups
+from app.analytics.schemas import AnalyticsCreate
+from app.config import settings
+from app.database import async_session_maker
+from app.exceptions import QuestionNotFound, AuthorIsNotPresentException, AnalyticsQueueIsFull
+from app.logger.logger import logger
+from app.questions.models import Question, SubQuestion
+from app.users.models import Users
+
+# 4 параметра на строку при лимите asyncpg в 32767 параметров на запрос
+INSERT_CHUNK_SIZE = 5000
+
+# Предельная пауза между повторами записи пачки, секунды
+MAX_RETRY_DELAY = 30.0
+
+# Текст ошибки PostgreSQL при вставке в месяц, для которого нет партиции
+MISSING_PARTITION_ERROR = "no partition of relation"
+
+# Маркер остановки: все события, поставленные в очередь до него, будут записаны
+_STOP = object()
+
+
+class AnalyticsIngestor:
+    """Очередь записи событий аналитики.
+
+    События проверяются по кэшу известных идентификаторов (при промахе - один
+    точечный запрос), ставятся в ограниченную очередь и записываются фоновой
+    задачей пачками: по достижении batch_size или через flush_interval секунд.
+    Одна пачка - INSERT ... VALUES на все строки (по INSERT_CHUNK_SIZE строк в
+    запросе), обновление часового и суточного агрегатов и один commit.
+
+    При сбое БД пачка записывается повторно с экспоненциальной паузой, а если
+    БД отвергает содержимое строк, пачка делится пополам, пока некорректная
+    строка не будет найдена и пропущена. Если для событий нет партиции,
+    партиции создаются вне расписания и запись повторяется.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, queue_size: int,
+                 write_retries: int, retry_backoff: float, author_ttl: float):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.write_retries = write_retries
+        self.retry_backoff = retry_backoff
+        self.author_ttl = author_ttl
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._question_ids: Set[int] = set()
+        self._subquestion_ids: Set[int] = set()
+        # Имя автора с моментом устаревания: имя пользователя может измениться
+        self._authors: Dict[int, Tuple[float, str]] = {}
+
+    async def load_cache(self):
+        """Загрузка известных идентификаторов вопросов, подвопросов и авторов"""
+        async with async_session_maker() as session:
+            questions = await session.execute(select(Question.id))
+            subquestions = await session.execute(select(SubQuestion.id))
+            authors = await session.execute(select(Users.id, Users.username))
+
+            self._question_ids = set(questions.scalars().all())
+            self._subquestion_ids = set(subquestions.scalars().all())
+            expires_at = time.monotonic() + self.author_ttl
+            self._authors = {row.id: (expires_at, row.username) for row in authors.all()}
+
+    async def _exists(self, model, model_id: int) -> bool:
+        async with async_session_maker() as session:
+            result = await session.execute(select(model.id).where(model.id == model_id))
+            return result.scalar_one_or_none() is not None
+
+    async def _resolve_author(self, author_id: int) -> Optional[str]:
+        cached = self._authors.get(author_id)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+
+        async with async_session_maker() as session:
+            result = await session.execute(select(Users.username).where(Users.id == author_id))
+            username = result.scalar_one_or_none()
+
+        if username is not None:
+            self._authors[author_id] = (time.monotonic() + self.author_ttl, username)
+        else:
+            self._authors.pop(author_id, None)
+        return username
+
+    def forget_author(self, author_id: int):
+        """Сброс имени автора после изменения или удаления пользователя"""
+        self._authors.pop(author_id, None)
+
+    async def validate(self, analytics_data: AnalyticsCreate) -> dict:
+        """Проверка события и подготовка строки для записи"""
+        if analytics_data.question_id and analytics_data.question_id not in self._question_ids:
+            if not await self._exists(Question, analytics_data.question_id):
+                logger.warning(f"Вопрос с id {analytics_data.question_id} не обнаружен")
+                raise QuestionNotFound
+            self._question_ids.add(analytics_data.question_id)
+
+        if analytics_data.subquestion_id and analytics_data.subquestion_id not in self._subquestion_ids:
+            if not await self._exists(SubQuestion, analytics_data.subquestion_id):
+                logger.warning(f"Подвопрос с id {analytics_data.subquestion_id} не обнаружен")
+                raise QuestionNotFound
+            self._subquestion_ids.add(analytics_data.subquestion_id)
+
+        author = await self._resolve_author(analytics_data.author_id)
+        if author is None:
+            logger.warning(f"Автор с id {analytics_data.author_id} не обнаружен")
+            raise AuthorIsNotPresentException
+
+        return {
+            "question_id": analytics_data.question_id,
+            "subquestion_id": analytics_data.subquestion_id,
+            "author": author,
+            "created_at": datetime.now(Yekaterinburg_tz),
+        }
+
+    def submit(self, event: dict):
+        """Постановка события в очередь без ожидания записи"""
+        if self._queue is None:
+            raise AnalyticsQueueIsFull
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning("Очередь записи аналитики переполнена, событие отклонено")
+            raise AnalyticsQueueIsFull
+
+    async def _insert(self, batch: List[dict]):
+        async with async_session_maker() as session:
+            for start in range(0, len(batch), INSERT_CHUNK_SIZE):
+                await session.execute(insert(Analytics).values(batch[start:start + INSERT_CHUNK_SIZE]))
+            await upsert_rollups(session, batch)
+            await session.commit()
+
+    async def _write(self, batch: List[dict]):
+        """Запись пачки с повторами при сбоях БД и поиском отвергнутых строк"""
+        delay = self.retry_backoff
+        attempt = 0
+        partitions_checked = False
+        while True:
+            try:
+                await self._insert(batch)
+                return
+            except IntegrityError as e:
+                if MISSING_PARTITION_ERROR not in str(e.orig):
+                    await self._split(batch, e)
+                    return
+                if not partitions_checked:
+                    logger.warning("Нет партиции аналитики для записываемых событий, создаем партиции")
+                    await analytics_partition_maintainer.run_once()
+                    partitions_checked = True
+                    continue
+                error = e
+            except DataError as e:
+                await self._split(batch, e)
+                return
+            except Exception as e:
+                error = e
+
+            if attempt >= self.write_retries:
+                logger.error(f"Пачка аналитики ({len(batch)} событий) не записана "
+                             f"после {self.write_retries} повторов: {error}")
+                return
+            attempt += 1
+            logger.warning(f"Не удалось записать пачку аналитики ({len(batch)} событий), "
+                           f"повтор через {delay} с: {error}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RETRY_DELAY)
+
+    async def _split(self, batch: List[dict], error: Exception):
+        """БД отвергла содержимое пачки: повтор не поможет, пишем половины отдельно"""
+        if len(batch) == 1:
+            logger.warning(f"Событие аналитики отвергнуто БД и пропущено {batch[0]}: {error}")
+            return
+        middle = len(batch) // 2
+        await self._write(batch[:middle])
+        await self._write(batch[middle:])
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            event = await self._queue.get()
+            if event is _STOP:
+                return
+
+            batch = [event]
+            stopping = False
+            deadline = loop.time() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if event is _STOP:
+                    stopping = True
+                    break
+                batch.append(event)
+
+            await self._write(batch)
+            if stopping:
+                return
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        await self.load_cache()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Запись всех принятых событий и остановка фоновой задачи"""
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        self._queue = None
+
+
+analytics_ingestor = AnalyticsIngestor(
+    batch_size=settings.ANALYTICS_BATCH_SIZE,
+    flush_interval=settings.ANALYTICS_FLUSH_INTERVAL,
+    queue_size=settings.ANALYTICS_QUEUE_SIZE,
+    write_retries=settings.ANALYTICS_WRITE_RETRIES,
+    retry_backoff=settings.ANALYTICS_RETRY_BACKOFF,
+    author_ttl=settings.ANALYTICS_AUTHOR_CACHE_TTL,
+)
@@ -1,5 +1,5 @@
 import pytz
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index
 from datetime import datetime
 from app.database import Base
 
@@ -7,10 +7,44 @@ Yekaterinburg_tz = pytz.timezone('Asia/Yekaterinburg')
 
 
 class Analytics(Base):
+    """Сырые события аналитики, таблица разбита на помесячные партиции по created_at"""
     __tablename__ = 'analytics'
+    __table_args__ = (
+        Index('ix_analytics_created_at_brin', 'created_at', postgresql_using='brin'),
+        Index('ix_analytics_question_id', 'question_id'),
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     question_id = Column(Integer, nullable=True)
     subquestion_id = Column(Integer, nullable=True)
     author = Column(String, nullable=True)
-    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(Yekaterinburg_tz), nullable=True)
+    created_at = Column(DateTime(timezone=True), primary_key=True,
+                        default=lambda: datetime.now(Yekaterinburg_tz), nullable=False)
+
+
+class AnalyticsRollupMixin:
+    """Предагрегированные счетчики событий аналитики за период bucket.
+
+    Отсутствующие question_id / subquestion_id / author хранятся как 0 и '',
+    чтобы все измерения могли входить в первичный ключ и служить целью ON CONFLICT.
+    """
+    bucket = Column(DateTime(timezone=True), primary_key=True)
+    question_id = Column(Integer, primary_key=True, default=0, server_default='0')
+    subquestion_id = Column(Integer, primary_key=True, default=0, server_default='0')
+    author = Column(String, primary_key=True, default='', server_default='')
+    count = Column(Integer, nullable=False, default=0, server_default='0')
+
+
+class AnalyticsHourly(AnalyticsRollupMixin, Base):
+    __tablename__ = 'analytics_hourly'
+    __table_args__ = (
+        Index('ix_analytics_hourly_question_id_bucket', 'question_id', 'bucket'),
+    )
+
+
+class AnalyticsDaily(AnalyticsRollupMixin, Base):
+    __tablename__ = 'analytics_daily'
+    __table_args__ = (
+        Index('ix_analytics_daily_question_id_bucket', 'question_id', 'bucket'),
+    )
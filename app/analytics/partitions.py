@@ -0,0 +1,135 @@
+import asyncio
+import re
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.analytics.models import Analytics, Yekaterinburg_tz
+from app.config import settings
+from app.database import async_session_maker
+from app.logger.logger import logger
+
+PARTITION_NAME = re.compile(r"^analytics_y(\d{4})m(\d{2})$")
+
+# Ключ advisory-блокировки, чтобы воркеры не обслуживали партиции одновременно
+MAINTENANCE_LOCK_KEY = 0x616E616C
+
+
+def month_start(moment: datetime) -> datetime:
+    """Начало месяца по Екатеринбургу"""
+    local = moment.astimezone(Yekaterinburg_tz)
+    return Yekaterinburg_tz.localize(datetime(local.year, local.month, 1))
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return Yekaterinburg_tz.localize(datetime(index // 12, index % 12 + 1, 1))
+
+
+def partition_name(month: datetime) -> str:
+    return f"{Analytics.__tablename__}_y{month.year:04d}m{month.month:02d}"
+
+
+async def list_partitions(session: AsyncSession) -> List[str]:
+    result = await session.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = CAST(:parent AS regclass)"
+    ), {"parent": Analytics.__tablename__})
+    return list(result.scalars().all())
+
+
+async def ensure_partitions(session: AsyncSession, ahead: int) -> List[str]:
+    """Создание партиций текущего месяца и ahead следующих"""
+    current = month_start(datetime.now(Yekaterinburg_tz))
+    existing = set(await list_partitions(session))
+    created = []
+
+    for offset in range(ahead + 1):
+        month = add_months(current, offset)
+        name = partition_name(month)
+        if name in existing:
+            continue
+        # Границы - литералы из datetime, DDL не принимает параметры
+        await session.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {Analytics.__tablename__} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+        ))
+        created.append(name)
+
+    return created
+
+
+async def drop_expired_partitions(session: AsyncSession, retention_months: int) -> List[str]:
+    """Удаление партиций, целиком старше retention_months месяцев"""
+    cutoff = add_months(month_start(datetime.now(Yekaterinburg_tz)), -retention_months)
+    dropped = []
+
+    for name in await list_partitions(session):
+        match = PARTITION_NAME.match(name)
+        if match is None:
+            continue
+        month = Yekaterinburg_tz.localize(datetime(int(match.group(1)), int(match.group(2)), 1))
+        if add_months(month, 1) <= cutoff:
+            await session.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            dropped.append(name)
+
+    return dropped
+
+
+class AnalyticsPartitionMaintainer:
+    """Фоновое обслуживание партиций аналитики.
+
+    Заранее создает партиции на ahead месяцев вперед и, если задан срок хранения,
+    удаляет устаревшие партиции целиком вместо DELETE по сырым событиям.
+    Агрегаты analytics_hourly / analytics_daily при этом сохраняются.
+    """
+
+    def __init__(self, ahead: int, retention_months: Optional[int], check_interval: float):
+        self.ahead = ahead
+        self.retention_months = retention_months
+        self.check_interval = check_interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self):
+        try:
+            async with async_session_maker() as session:
+                await session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+                created = await ensure_partitions(session, self.ahead)
+                dropped = []
+                if self.retention_months is not None:
+                    dropped = await drop_expired_partitions(session, self.retention_months)
+                await session.commit()
+
+            if created:
+                logger.info(f"Созданы партиции аналитики: {', '.join(created)}")
+            if dropped:
+                logger.info(f"Удалены устаревшие партиции аналитики: {', '.join(dropped)}")
+        except Exception as e:
+            logger.warning(f"Ошибка обслуживания партиций аналитики: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.run_once()
+
+    async def start(self):
+        if self._task is None:
+            await self.run_once()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+analytics_partition_maintainer = AnalyticsPartitionMaintainer(
+    ahead=settings.ANALYTICS_PARTITIONS_AHEAD,
+    retention_months=settings.ANALYTICS_RETENTION_MONTHS,
+    check_interval=settings.ANALYTICS_PARTITION_CHECK_INTERVAL,
+)
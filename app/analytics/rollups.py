@@ -0,0 +1,177 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple, Type
+from sqlalchemy import select, func, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.analytics.models import AnalyticsHourly, AnalyticsDaily, AnalyticsRollupMixin, Yekaterinburg_tz
+from app.analytics.schemas import AnalyticsGranularity
+from app.exceptions import InvalidAnalyticsRange
+from app.questions.models import Question, SubQuestion
+
+# 5 параметров на строку при лимите asyncpg в 32767 параметров на запрос
+UPSERT_CHUNK_SIZE = 5000
+
+ROLLUP_TABLES = {
+    AnalyticsGranularity.HOUR: AnalyticsHourly,
+    AnalyticsGranularity.DAY: AnalyticsDaily,
+}
+
+
+def hour_bucket(moment: datetime) -> datetime:
+    return moment.astimezone(Yekaterinburg_tz).replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(moment: datetime) -> datetime:
+    """Начало суток по Екатеринбургу"""
+    return Yekaterinburg_tz.localize(
+        moment.astimezone(Yekaterinburg_tz).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+    )
+
+
+def aggregate_events(events: List[dict], bucket_of) -> List[dict]:
+    """Свертка пачки событий в строки агрегата: одна строка на (bucket, вопрос, подвопрос, автор)"""
+    counts = Counter(
+        (
+            bucket_of(event["created_at"]),
+            event.get("question_id") or 0,
+            event.get("subquestion_id") or 0,
+            event.get("author") or "",
+        )
+        for event in events
+        if event.get("created_at") is not None
+    )
+    # Упорядоченная вставка снижает риск взаимоблокировок между воркерами
+    return [
+        {"bucket": bucket, "question_id": question_id, "subquestion_id": subquestion_id, "author": author,
+         "count": count}
+        for (bucket, question_id, subquestion_id, author), count in sorted(counts.items())
+    ]
+
+
+async def upsert_rollups(session: AsyncSession, events: List[dict]):
+    """Инкрементальное обновление часового и суточного агрегатов в текущей транзакции"""
+    for model, bucket_of in ((AnalyticsHourly, hour_bucket), (AnalyticsDaily, day_bucket)):
+        rows = aggregate_events(events, bucket_of)
+        for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            stmt = pg_insert(model).values(rows[start:start + UPSERT_CHUNK_SIZE])
+            await session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[model.bucket, model.question_id, model.subquestion_id, model.author],
+                    set_={"count": model.count + stmt.excluded.count},
+                )
+            )
+
+
+def align_range(date_from: datetime, date_to: datetime, bucket_of, step: timedelta) -> Tuple[datetime, datetime]:
+    """Расширение диапазона до целых бакетов: начало вниз, конец вверх"""
+    aligned_to = bucket_of(date_to)
+    if aligned_to < date_to:
+        aligned_to = bucket_of(aligned_to + step)
+    return bucket_of(date_from), aligned_to
+
+
+def resolve_range(date_from: Optional[datetime], date_to: Optional[datetime]) -> Tuple[datetime, datetime]:
+    """Диапазон [date_from, date_to), по умолчанию - последние 7 суток, расширенный до целых часов"""
+    date_to = date_to or datetime.now(Yekaterinburg_tz)
+    date_from = date_from or date_to - timedelta(days=7)
+    if date_to.tzinfo is None:
+        date_to = Yekaterinburg_tz.localize(date_to)
+    if date_from.tzinfo is None:
+        date_from = Yekaterinburg_tz.localize(date_from)
+    if date_from >= date_to:
+        raise InvalidAnalyticsRange
+    return align_range(date_from, date_to, hour_bucket, timedelta(hours=1))
+
+
+def pick_rollup(date_from: datetime, date_to: datetime) -> Type[AnalyticsRollupMixin]:
+    """Суточный агрегат, если границы диапазона совпадают с началом суток, иначе часовой"""
+    if day_bucket(date_from) == date_from and day_bucket(date_to) == date_to:
+        return AnalyticsDaily
+    return AnalyticsHourly
+
+
+class AnalyticsRollupService:
+    """Запросы дашбордов к предагрегированным таблицам.
+
+    Границы диапазона должны совпадать с началом часа (см. resolve_range):
+    бакет попадает в выборку, если date_from <= bucket < date_to. Для суточной
+    разбивки timeseries диапазон дополнительно расширяется до целых суток.
+    """
+
+    @staticmethod
+    async def top_questions(db: AsyncSession, date_from: datetime, date_to: datetime, limit: int) -> List[dict]:
+        model = pick_rollup(date_from, date_to)
+        total = func.sum(model.count).label("count")
+        totals = (
+            select(model.question_id, total)
+            .where(model.bucket >= date_from, model.bucket < date_to, model.question_id != 0)
+            .group_by(model.question_id)
+            .order_by(total.desc(), model.question_id)
+            .limit(limit)
+            .subquery()
+        )
+        result = await db.execute(
+            select(totals.c.question_id, Question.text, totals.c.count)
+            .join(Question, Question.id == totals.c.question_id, isouter=True)
+            .order_by(totals.c.count.desc(), totals.c.question_id)
+        )
+        return [{"id": row.question_id, "text": row.text, "count": row.count} for row in result.all()]
+
+    @staticmethod
+    async def top_subquestions(db: AsyncSession, date_from: datetime, date_to: datetime, limit: int) -> List[dict]:
+        model = pick_rollup(date_from, date_to)
+        total = func.sum(model.count).label("count")
+        totals = (
+            select(model.subquestion_id, total)
+            .where(model.bucket >= date_from, model.bucket < date_to, model.subquestion_id != 0)
+            .group_by(model.subquestion_id)
+            .order_by(total.desc(), model.subquestion_id)
+            .limit(limit)
+            .subquery()
+        )
+        result = await db.execute(
+            select(totals.c.subquestion_id, SubQuestion.text, totals.c.count)
+            .join(SubQuestion, SubQuestion.id == totals.c.subquestion_id, isouter=True)
+            .order_by(totals.c.count.desc(), totals.c.subquestion_id)
+        )
+        return [{"id": row.subquestion_id, "text": row.text, "count": row.count} for row in result.all()]
+
+    @staticmethod
+    async def authors(db: AsyncSession, date_from: datetime, date_to: datetime, limit: int) -> List[dict]:
+        model = pick_rollup(date_from, date_to)
+        total = func.sum(model.count).label("count")
+        result = await db.execute(
+            select(model.author, total)
+            .where(model.bucket >= date_from, model.bucket < date_to, model.author != literal_column("''"))
+            .group_by(model.author)
+            .order_by(total.desc(), model.author)
+            .limit(limit)
+        )
+        return [{"author": row.author, "count": row.count} for row in result.all()]
+
+    @staticmethod
+    async def timeseries(
+            db: AsyncSession,
+            date_from: datetime,
+            date_to: datetime,
+            granularity: AnalyticsGranularity,
+            question_id: Optional[int] = None,
+            subquestion_id: Optional[int] = None,
+            author: Optional[str] = None
+    ) -> List[dict]:
+        model = ROLLUP_TABLES[granularity]
+        if granularity == AnalyticsGranularity.DAY:
+            date_from, date_to = align_range(date_from, date_to, day_bucket, timedelta(days=1))
+        query = select(model.bucket, func.sum(model.count).label("count")).where(
+            model.bucket >= date_from, model.bucket < date_to
+        )
+        if question_id is not None:
+            query = query.where(model.question_id == question_id)
+        if subquestion_id is not None:
+            query = query.where(model.subquestion_id == subquestion_id)
+        if author is not None:
+            query = query.where(model.author == author)
+
+        result = await db.execute(query.group_by(model.bucket).order_by(model.bucket))
+        return [{"bucket": row.bucket, "count": row.count} for row in result.all()]
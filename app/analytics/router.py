@@ -1,14 +1,16 @@
-from fastapi import APIRouter, status, Depends
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, status, Depends, Query
 from fastapi_versioning import version
-from sqlalchemy.orm import Session
-from sqlalchemy.future import select
-from app.analytics.models import Analytics
-from app.analytics.schemas import AnalyticsCreate
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.analytics.ingestion import analytics_ingestor
+from app.analytics.rollups import AnalyticsRollupService, resolve_range
+from app.analytics.schemas import AnalyticsCreate, AnalyticsGranularity, AnalyticsTopItem, AnalyticsAuthorActivity, \
+    AnalyticsTimeseriesPoint
+from app.dao.dependencies import get_current_admin_or_moderator_user
 from app.database import get_db
-from app.exceptions import QuestionNotFound, AuthorIsNotPresentException, FailedToCreateAnalyticsEntry
+from app.exceptions import FailedToCreateAnalyticsEntry, AnalyticsQueueIsFull, ErrorReceivingDataForDashboard
 from app.logger.logger import logger
-from app.questions.models import Question, SubQuestion
-from app.users.models import Users
 
 router_analytics = APIRouter(
     prefix="/analytics",
@@ -16,59 +18,96 @@ router_analytics = APIRouter(
 )
 
 
-@router_analytics.post("/write", status_code=status.HTTP_201_CREATED, summary="Запись в БД данных для анализа")
+@router_analytics.post("/write", status_code=status.HTTP_202_ACCEPTED, summary="Запись в БД данных для анализа")
 @version(1)
-async def create_analytics_entry(
-        analytics_data: AnalyticsCreate,
-        db: Session = Depends(get_db),
-):
+async def create_analytics_entry(analytics_data: AnalyticsCreate):
+    """Событие проверяется и ставится в очередь, запись в БД выполняется пачками в фоне"""
     try:
-        # Логируем входящие данные
-        logger.info(f"Получены данные аналитики: {analytics_data}")
+        event = await analytics_ingestor.validate(analytics_data)
+        analytics_ingestor.submit(event)
+        return event
+    except AnalyticsQueueIsFull as e:
+        raise e
+    except Exception as e:
+        logger.warning(f"Не удалось создать запись аналитики: {e}")
+        raise FailedToCreateAnalyticsEntry
 
-        # Проверка существования вопроса или подвопроса
-        question = None
-        if analytics_data.question_id:
-            query = select(Question).where(Question.id == analytics_data.question_id)
-            result = await db.execute(query)
-            question = result.scalars().first()
-            if not question:
-                logger.warning(f"Вопрос с id {analytics_data.question_id} не обнаружен")
-                raise QuestionNotFound
 
-        subquestion = None
-        if analytics_data.subquestion_id:
-            query = select(SubQuestion).where(SubQuestion.id == analytics_data.subquestion_id)
-            result = await db.execute(query)
-            subquestion = result.scalars().first()
-            if not subquestion:
-                logger.warning(f"Подвопрос с id {analytics_data.subquestion_id} не обнаружен")
-                raise QuestionNotFound
+def analytics_range(
+        date_from: Optional[datetime] = Query(
+            None, description="Начало диапазона (округляется вниз до часа), по умолчанию - 7 суток назад"),
+        date_to: Optional[datetime] = Query(
+            None, description="Конец диапазона (не включительно, округляется вверх до часа), по умолчанию - сейчас")
+) -> tuple[datetime, datetime]:
+    return resolve_range(date_from, date_to)
 
-        # Проверка существования автора
-        query = select(Users).where(Users.id == analytics_data.author_id)
-        result = await db.execute(query)
-        author = result.scalars().first()
-        if not author:
-            logger.warning(f"Автор с id {analytics_data.author_id} не обнаружен")
-            raise AuthorIsNotPresentException
 
-        # Создание новой записи
-        new_entry = Analytics(
-            question_id=analytics_data.question_id,
-            subquestion_id=analytics_data.subquestion_id,
-            author=author.username,
-        )
-        logger.info(f"Создание новой записи аналитики: {new_entry}")
+@router_analytics.get("/top-questions", response_model=List[AnalyticsTopItem],
+                      summary="Самые запрашиваемые вопросы за период")
+@version(1)
+async def get_top_questions(
+        date_range: tuple[datetime, datetime] = Depends(analytics_range),
+        limit: int = Query(10, ge=1, le=100),
+        db: AsyncSession = Depends(get_db),
+        current_user=Depends(get_current_admin_or_moderator_user)
+):
+    try:
+        return await AnalyticsRollupService.top_questions(db, *date_range, limit)
+    except Exception as e:
+        logger.warning(f"Ошибка при получении топа вопросов: {e}")
+        raise ErrorReceivingDataForDashboard
+
+
+@router_analytics.get("/top-subquestions", response_model=List[AnalyticsTopItem],
+                      summary="Самые запрашиваемые подвопросы за период")
+@version(1)
+async def get_top_subquestions(
+        date_range: tuple[datetime, datetime] = Depends(analytics_range),
+        limit: int = Query(10, ge=1, le=100),
+        db: AsyncSession = Depends(get_db),
+        current_user=Depends(get_current_admin_or_moderator_user)
+):
+    try:
+        return await AnalyticsRollupService.top_subquestions(db, *date_range, limit)
+    except Exception as e:
+        logger.warning(f"Ошибка при получении топа подвопросов: {e}")
+        raise ErrorReceivingDataForDashboard
+
 
-        db.add(new_entry)
-        await db.commit()
-        await db.refresh(new_entry)
+@router_analytics.get("/authors", response_model=List[AnalyticsAuthorActivity],
+                      summary="Активность авторов за период")
+@version(1)
+async def get_authors_activity(
+        date_range: tuple[datetime, datetime] = Depends(analytics_range),
+        limit: int = Query(10, ge=1, le=100),
+        db: AsyncSession = Depends(get_db),
+        current_user=Depends(get_current_admin_or_moderator_user)
+):
+    try:
+        return await AnalyticsRollupService.authors(db, *date_range, limit)
+    except Exception as e:
+        logger.warning(f"Ошибка при получении активности авторов: {e}")
+        raise ErrorReceivingDataForDashboard
 
-        logger.info(f"Запись аналитики успешно создана: {new_entry}")
-        return new_entry
 
+@router_analytics.get("/timeseries", response_model=List[AnalyticsTimeseriesPoint],
+                      summary="Количество запросов по часам или суткам")
+@version(1)
+async def get_timeseries(
+        date_range: tuple[datetime, datetime] = Depends(analytics_range),
+        granularity: AnalyticsGranularity = AnalyticsGranularity.DAY,
+        question_id: Optional[int] = None,
+        subquestion_id: Optional[int] = None,
+        author: Optional[str] = None,
+        db: AsyncSession = Depends(get_db),
+        current_user=Depends(get_current_admin_or_moderator_user)
+):
+    """Точки без событий не возвращаются"""
+    try:
+        return await AnalyticsRollupService.timeseries(
+            db, *date_range, granularity,
+            question_id=question_id, subquestion_id=subquestion_id, author=author
+        )
     except Exception as e:
-        logger.warning(f"Не удалось создать запись аналитики: {e}")
-        await db.rollback()
-        raise FailedToCreateAnalyticsEntry
\ No newline at end of file
+        logger.warning(f"Ошибка при получении временного ряда аналитики: {e}")
+        raise ErrorReceivingDataForDashboard
@@ -1,3 +1,5 @@
+from datetime import datetime
+from enum import Enum
 from typing import Optional
 from pydantic import BaseModel
 
@@ -9,3 +11,24 @@ class AnalyticsCreate(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class AnalyticsGranularity(str, Enum):
+    HOUR = "hour"
+    DAY = "day"
+
+
+class AnalyticsTopItem(BaseModel):
+    id: int
+    text: Optional[str] = None
+    count: int
+
+
+class AnalyticsAuthorActivity(BaseModel):
+    author: str
+    count: int
+
+
+class AnalyticsTimeseriesPoint(BaseModel):
+    bucket: datetime
+    count: int
@@ -1,28 +1,27 @@
 from typing import Optional
 import pytz
-from passlib.context import CryptContext
 from jose import jwt
 from datetime import datetime, timedelta
 from pydantic import EmailStr
 from app.dao.dao import UsersDAO
+from app.auth.password_hashing import password_hasher
+from app.auth.token_versions import token_versions
 from app.config import settings
 from app.exceptions import InvalidRefreshToken, EmailOrUsernameWasNotFound, RefreshTokenHasExpired, FailedToGetUserRoles
 from app.logger.logger import logger
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 
 def get_current_time_yekaterinburg() -> datetime:
     yekaterinburg_tz = pytz.timezone('Asia/Yekaterinburg')
     return datetime.now(yekaterinburg_tz)
 
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+async def get_password_hash(password: str) -> str:
+    return await password_hasher.hash(password)
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
 
 
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(hours=24)):
@@ -41,7 +40,7 @@ async def authenticate_user(email: Optional[EmailStr], username: Optional[str],
     elif username:
         user = await users_dao.find_one_or_none(username=username)
 
-    if user and verify_password(password, user.hashed_password):
+    if user and await verify_password(password, user.hashed_password):
         return user
     return None
 
@@ -86,7 +85,8 @@ async def refresh_access_token(refresh_token: str):
         access_token = create_access_token(data={
             "sub": str(user.id),
             "username": str(user.username),
-            "roles": user_with_roles.roles
+            "roles": user_with_roles.roles,
+            "ver": token_versions.current(user.id)
         })
 
         return {"access_token": access_token}
@@ -1,19 +1,18 @@
 import jwt
-from fastapi import APIRouter, status, Response, HTTPException, Depends
+from fastapi import APIRouter, status, Response, HTTPException
 from jwt.exceptions import ExpiredSignatureError, PyJWTError
 from app.auth.auth import get_password_hash, create_access_token, create_reset_token, verify_password, \
     create_refresh_token, refresh_access_token
+from app.auth.token_versions import token_versions
 from app.config import settings
 from app.dao.dao import UsersDAO
 from app.exceptions import IncorrectTokenFormatException, \
     TokenExpiredException, UserIsNotPresentException, PasswordUpdatedSuccessfully, EmailOrUsernameWasNotFound, \
-    InvalidPassword, FailedToGetUserRoles, ErrorGettingUser, EmptyPasswordError, EmptyUserNameOrEmailError, \
-    DatabaseExceptions
+    InvalidPassword, ErrorGettingUser, EmptyPasswordError, EmptyUserNameOrEmailError, \
+    DatabaseExceptions, PasswordHashingOverloaded
 from app.logger.logger import logger
-from app.database import get_db
 from app.auth.schemas import SUserSignUp, ForgotPasswordRequest, ResetPasswordRequest, RefreshTokenRequest
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 from app.utils import send_reset_password_email
 from fastapi_versioning import version
 
@@ -25,14 +24,8 @@ router_auth = APIRouter(
 
 @router_auth.post("/login", summary="Авторизация пользователя")
 @version(1)
-async def login_user(response: Response, user_data: SUserSignUp, db: AsyncSession = Depends(get_db)):
+async def login_user(response: Response, user_data: SUserSignUp):
     """Логика авторизации для входа на горячую линию"""
-    try:
-        await db.execute(text("SELECT 1"))
-    except Exception as e:
-        logger.error(f"База данных не доступна:{e}")
-        raise DatabaseExceptions(str(e))
-
     users_dao = UsersDAO()
     try:
         if not user_data.email and not user_data.username:
@@ -43,32 +36,34 @@ async def login_user(response: Response, user_data: SUserSignUp, db: AsyncSessio
             logger.warning("Пароль не может быть пустым")
             raise EmptyPasswordError()
 
-        user = (await users_dao.find_one_or_none(email=user_data.email)
-                or await users_dao.find_one_or_none(username=user_data.username))
+        try:
+            user = await users_dao.find_for_login(email=user_data.email, username=user_data.username)
+        except SQLAlchemyError as e:
+            logger.error(f"База данных не доступна: {e}")
+            raise DatabaseExceptions(str(e))
 
         if not user:
             logger.warning("Пользователь не найден")
             raise EmailOrUsernameWasNotFound()
 
-        if not verify_password(user_data.password, user.hashed_password):
+        if not await verify_password(user_data.password, user.hashed_password):
             logger.warning("Неверный пароль")
             raise InvalidPassword
 
-        user_with_roles = await users_dao.get_user_with_roles(user.id)
-        if not user_with_roles:
-            logger.warning("Не удалось получить роли пользователя")
-            raise FailedToGetUserRoles()
+        roles = [role.name for role in user.roles]
 
         access_token = create_access_token({
             "sub": str(user.id),
             "username": str(user.username),
-            "roles": user_with_roles.roles
+            "roles": roles,
+            "ver": token_versions.current(user.id)
         })
 
         refresh_token = create_refresh_token({
             "sub": str(user.id),
             "username": str(user.username),
-            "roles": user_with_roles.roles
+            "roles": roles,
+            "ver": token_versions.current(user.id)
         })
 
         response.set_cookie(
@@ -97,6 +92,8 @@ async def login_user(response: Response, user_data: SUserSignUp, db: AsyncSessio
     except ValueError as ve:
         logger.warning(f"Ошибка ввода данных: {ve}")
         return {"error": str(ve), "status_code": 400}
+    except (PasswordHashingOverloaded, DatabaseExceptions) as e:
+        raise e
     except Exception as e:
         logger.warning(f"Ошибка при авторизации: {e}")
         return ErrorGettingUser
@@ -148,7 +145,7 @@ async def reset_password(reset_password_request: ResetPasswordRequest):
         logger.warning(f"Пользователь не найден по электронной почте: {email}")
         raise UserIsNotPresentException
 
-    hashed_password = get_password_hash(new_password)
+    hashed_password = await get_password_hash(new_password)
     await users_dao.update(user.id, hashed_password=hashed_password)
 
     return PasswordUpdatedSuccessfully
@@ -0,0 +1,92 @@
+import asyncio
+from typing import Dict, Optional
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.database import async_session_maker
+from app.logger.logger import logger
+from app.users.models import UserTokenVersion
+
+
+class TokenVersionRegistry:
+    """Снимок версий токенов пользователей в памяти процесса.
+
+    Позволяет проверять claim ver без запроса к БД. Снимок периодически
+    перечитывается целиком (таблица содержит по строке на измененного
+    пользователя), поэтому изменения из других воркеров становятся видны
+    не позже чем через refresh_interval секунд.
+    """
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self._versions: Dict[int, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.loaded = False
+
+    def current(self, user_id: int) -> int:
+        return self._versions.get(user_id, 0)
+
+    def is_current(self, user_id: int, version: Optional[int]) -> bool:
+        """Можно ли доверять ролям из токена с указанной версией"""
+        if not self.loaded or version is None:
+            return False
+        return version >= self.current(user_id)
+
+    async def load(self):
+        async with async_session_maker() as session:
+            result = await session.execute(select(UserTokenVersion.user_id, UserTokenVersion.version))
+            self._versions = {row.user_id: row.version for row in result.all()}
+        self.loaded = True
+
+    async def bump(self, session: AsyncSession, user_id: int) -> int:
+        """Увеличение версии в транзакции вызывающего кода, commit выполняет он.
+
+        Снимок не меняется: после commit вызывающий код передает версию в remember,
+        иначе откаченное увеличение попало бы в токены при входе.
+        """
+        stmt = pg_insert(UserTokenVersion).values(user_id=user_id, version=1)
+        result = await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[UserTokenVersion.user_id],
+                set_={"version": UserTokenVersion.version + 1},
+            ).returning(UserTokenVersion.version)
+        )
+        return result.scalar_one()
+
+    def remember(self, user_id: int, version: int):
+        """Учет зафиксированной версии в снимке до его следующего обновления"""
+        if version > self._versions.get(user_id, 0):
+            self._versions[user_id] = version
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.load()
+            except Exception as e:
+                logger.warning(f"Не удалось обновить версии токенов: {e}")
+
+    async def start(self):
+        if self._task is not None:
+            return
+        try:
+            await self.load()
+        except Exception as e:
+            logger.warning(f"Не удалось загрузить версии токенов: {e}")
+        if settings.AUTH_MODE == "claims" and not self.loaded:
+            logger.warning("AUTH_MODE=claims, но версии токенов не загружены: "
+                           "до следующего обновления роли проверяются по БД")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+token_versions = TokenVersionRegistry(refresh_interval=settings.TOKEN_VERSION_REFRESH_INTERVAL)
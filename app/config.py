@@ -14,14 +14,54 @@ class Settings(BaseSettings):
     DB_PASS: str
     DB_NAME: str
 
+    # Пул соединений на процесс: постоянные соединения, сверх них при всплесках,
+    # ожидание свободного соединения (секунды), пересоздание старых соединений
+    # (секунды, -1 - не пересоздавать) и проверка соединения перед выдачей
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Кэш подготовленных выражений: asyncpg (statement_cache_size) и SQLAlchemy
+    # (prepared_statement_cache_size); 0 отключает, например при работе через pgbouncer
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 100
+
     @property
     def DATABASE_URL(self):
         return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASS}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    # Реплики для чтения: URL через запятую (postgresql+asyncpg://...), пусто - читать с основной БД.
+    # Недоступная реплика исключается на DB_REPLICA_RETRY_INTERVAL секунд
+    DB_REPLICA_URLS: str = ""
+    DB_REPLICA_RETRY_INTERVAL: float = 30.0
+
+    @property
+    def REPLICA_DATABASE_URLS(self) -> list[str]:
+        return [url.strip() for url in self.DB_REPLICA_URLS.split(",") if url.strip()]
+
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
 
+    # Кэш пользователей с ролями в get_current_user: время жизни записи (секунды, 0 - выключен)
+    # и максимальное число записей
+    USER_CACHE_TTL: float = 30.0
+    USER_CACHE_MAXSIZE: int = 10000
+
+    # Проверка ролей для эндпоинтов админа и модератора: "database" - по БД,
+    # "claims" - по ролям из токена, если его версия (claim ver) актуальна
+    AUTH_MODE: Literal["database", "claims"] = "database"
+    # Период перечитывания версий токенов, секунды
+    TOKEN_VERSION_REFRESH_INTERVAL: float = 5.0
+
+    # Период сверки поискового индекса вопросов с БД (изменения из других воркеров), секунды
+    SEARCH_INDEX_REFRESH_INTERVAL: float = 10.0
+
+    # Пул хеширования паролей bcrypt: число потоков и сколько операций может ждать в очереди
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 100
+
     # Настройки почты
     MAIL_USERNAME: str
     MAIL_PASSWORD: str
@@ -39,6 +79,42 @@ class Settings(BaseSettings):
 
     TELEGRAM_TOKEN: str
     CHAT_ID: int
+    # Отправка ошибок в Telegram: адрес API (можно подменить локальным сервером), емкость очереди,
+    # период сбора записей в одно сообщение, минимальный интервал между сообщениями и таймаут, секунды
+    TELEGRAM_API_URL: str = "https://api.telegram.org"
+    TELEGRAM_QUEUE_SIZE: int = 1000
+    TELEGRAM_BATCH_INTERVAL: float = 2.0
+    TELEGRAM_MIN_SEND_INTERVAL: float = 3.0
+    TELEGRAM_TIMEOUT: float = 5.0
+
+    # Логирование запросов: доля логируемых запросов (0..1), исключенные префиксы путей
+    # через запятую и сколько байт тела запроса и ответа попадает в лог
+    LOG_REQUEST_SAMPLE_RATE: float = 1.0
+    LOG_EXCLUDED_PATHS: str = "/docs,/openapi.json,/v1/docs,/v1/openapi.json"
+    LOG_BODY_MAX_BYTES: int = 500
+
+    @property
+    def LOG_EXCLUDED_PATH_PREFIXES(self) -> list[str]:
+        return [path.strip() for path in self.LOG_EXCLUDED_PATHS.split(",") if path.strip()]
+
+    # Период сброса накопленных просмотров вопросов в БД, секунды
+    VIEW_COUNTER_FLUSH_INTERVAL: float = 5.0
+
+    # Пакетная запись аналитики: размер пачки, период сброса (секунды) и емкость очереди
+    ANALYTICS_BATCH_SIZE: int = 500
+    ANALYTICS_FLUSH_INTERVAL: float = 2.0
+    ANALYTICS_QUEUE_SIZE: int = 10000
+    # Повторы записи пачки при сбое БД и начальная пауза между ними (удваивается), секунды
+    ANALYTICS_WRITE_RETRIES: int = 5
+    ANALYTICS_RETRY_BACKOFF: float = 0.5
+    # Время жизни имен авторов в кэше проверки событий, секунды
+    ANALYTICS_AUTHOR_CACHE_TTL: float = 60.0
+
+    # Помесячные партиции аналитики: сколько месяцев создавать наперед, срок хранения
+    # в месяцах (None - не удалять) и период проверки, секунды
+    ANALYTICS_PARTITIONS_AHEAD: int = 3
+    ANALYTICS_RETENTION_MONTHS: Optional[int] = None
+    ANALYTICS_PARTITION_CHECK_INTERVAL: float = 21600.0
 
     class Config:
         env_file = ".env"
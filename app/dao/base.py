@@ -1,21 +1,88 @@
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, List, Optional
 
 from app.database import async_session_maker
-from sqlalchemy import select, insert, update, delete
+from sqlalchemy import event, select, insert, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.exceptions import UserNotFoundException
 from sqlalchemy.exc import SQLAlchemyError
 from app.logger.logger import logger
 
 
+@asynccontextmanager
+async def unit_of_work() -> AsyncIterator[AsyncSession]:
+    """Одна сессия и одна транзакция на несколько вызовов DAO.
+
+    Сессия передается в методы DAO параметром session: они выполняют только flush,
+    commit делается при выходе из блока, rollback - при исключении.
+    """
+    async with async_session_maker() as session:
+        async with session.begin():
+            yield session
+
+
+class SessionScope:
+    """Сессия одного вызова DAO: переданная снаружи или собственная.
+
+    Собственная сессия, как и раньше, фиксируется и закрывается самим методом.
+    Внешнюю сессию метод только сбрасывает (flush), а действия after_commit
+    откладывает до фиксации транзакции ее владельцем.
+    """
+
+    def __init__(self, session: Optional[AsyncSession] = None):
+        self.owned = session is None
+        self.session = session
+        self._callbacks: List[Callable[[], None]] = []
+
+    async def __aenter__(self) -> "SessionScope":
+        if self.owned:
+            self.session = async_session_maker()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self.owned:
+            await self.session.close()
+
+    def after_commit(self, callback: Callable[[], None]):
+        if self.owned:
+            self._callbacks.append(callback)
+        else:
+            event.listen(self.session.sync_session, "after_commit", lambda _: callback(), once=True)
+
+    async def commit(self):
+        if not self.owned:
+            await self.session.flush()
+            return
+
+        await self.session.commit()
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    async def rollback(self):
+        if self.owned:
+            await self.session.rollback()
+
+
 class BaseDAO:
     model = None
 
     @classmethod
-    async def find_by_id(cls, model_id: int):
-        async with async_session_maker() as session:
+    async def on_write(cls, scope: SessionScope, model_id: int):
+        """Вызывается в транзакции изменения или удаления экземпляра перед commit"""
+        pass
+
+    @classmethod
+    def on_change(cls, model_id: int):
+        """Вызывается после изменения или удаления экземпляра, для сброса кэшей"""
+        pass
+
+    @classmethod
+    async def find_by_id(cls, model_id: int, session: Optional[AsyncSession] = None):
+        async with SessionScope(session) as scope:
             try:
                 query = select(cls.model).filter_by(id=model_id)
-                result = await session.execute(query)
+                result = await scope.session.execute(query)
                 instance = result.scalar_one_or_none()
                 if instance is None:
                     logger.warning(f"Экземпляр с идентификатором {model_id} не найден.")
@@ -25,11 +92,11 @@ class BaseDAO:
                 raise
 
     @classmethod
-    async def find_one_or_none(cls, **filter_by) -> Optional[model]:
-        async with async_session_maker() as session:
+    async def find_one_or_none(cls, session: Optional[AsyncSession] = None, **filter_by) -> Optional[model]:
+        async with SessionScope(session) as scope:
             try:
                 query = select(cls.model).filter_by(**filter_by)
-                result = await session.execute(query)
+                result = await scope.session.execute(query)
                 instance = result.scalar_one_or_none()
                 return instance
             except SQLAlchemyError as e:
@@ -37,11 +104,11 @@ class BaseDAO:
                 raise
 
     @classmethod
-    async def find_all(cls, **filter_by) -> list:
-        async with async_session_maker() as session:
+    async def find_all(cls, session: Optional[AsyncSession] = None, **filter_by) -> list:
+        async with SessionScope(session) as scope:
             try:
                 query = select(cls.model).filter_by(**filter_by)
-                result = await session.execute(query)
+                result = await scope.session.execute(query)
                 instances = result.scalars().all()
                 return instances
             except SQLAlchemyError as e:
@@ -49,25 +116,25 @@ class BaseDAO:
                 raise
 
     @classmethod
-    async def add(cls, **data) -> model:
-        async with async_session_maker() as session:
+    async def add(cls, session: Optional[AsyncSession] = None, **data) -> model:
+        async with SessionScope(session) as scope:
             try:
                 query = insert(cls.model).values(**data).returning(cls.model)
-                result = await session.execute(query)
-                await session.commit()
+                result = await scope.session.execute(query)
                 instance = result.scalar_one()
+                await scope.commit()
                 return instance
             except SQLAlchemyError as e:
-                await session.rollback()
+                await scope.rollback()
                 logger.warning(f"Ошибка при добавлении экземпляра с данными. {data}: {e}")
                 raise
 
     @classmethod
-    async def delete(cls, model_id: int):
-        async with async_session_maker() as session:
+    async def delete(cls, model_id: int, session: Optional[AsyncSession] = None):
+        async with SessionScope(session) as scope:
             try:
                 query = select(cls.model).filter_by(id=model_id)
-                result = await session.execute(query)
+                result = await scope.session.execute(query)
                 instance = result.scalar_one_or_none()
 
                 if not instance:
@@ -75,26 +142,30 @@ class BaseDAO:
                     raise UserNotFoundException
 
                 stmt = delete(cls.model).where(cls.model.id == model_id)
-                await session.execute(stmt)
-                await session.commit()
+                await scope.session.execute(stmt)
+                await cls.on_write(scope, model_id)
+                scope.after_commit(lambda: cls.on_change(model_id))
+                await scope.commit()
             except SQLAlchemyError as e:
-                await session.rollback()
+                await scope.rollback()
                 logger.warning(f"Ошибка удаления экземпляра с идентификатором {model_id}: {e}")
                 raise
 
     @classmethod
-    async def update(cls, model_id: int, **data):
-        async with async_session_maker() as session:
+    async def update(cls, model_id: int, session: Optional[AsyncSession] = None, **data):
+        async with SessionScope(session) as scope:
             try:
                 stmt = update(cls.model).where(cls.model.id == model_id).values(**data)
-                result = await session.execute(stmt)
+                result = await scope.session.execute(stmt)
 
                 if result.rowcount == 0:
                     logger.warning(f"Экземпляр с идентификатором {model_id} для обновления не найден.")
                     raise UserNotFoundException
 
-                await session.commit()
+                await cls.on_write(scope, model_id)
+                scope.after_commit(lambda: cls.on_change(model_id))
+                await scope.commit()
             except SQLAlchemyError as e:
-                await session.rollback()
+                await scope.rollback()
                 logger.warning(f"Ошибка обновления экземпляра с идентификатором {model_id}: {e}")
                 raise
@@ -1,24 +1,43 @@
 from typing import Optional, List
-from sqlalchemy import insert, delete
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
-from app.dao.base import BaseDAO
-from app.database import async_session_maker
+from sqlalchemy.orm import selectinload, joinedload
+from app.analytics.ingestion import analytics_ingestor
+from app.auth.token_versions import token_versions
+from app.dao.base import BaseDAO, SessionScope
+from app.dao.user_cache import user_cache
 from app.logger.logger import logger
 from app.questions.models import Question
 from app.users.models import Users, Roles, Permissions, role_user_association
 from app.users.schemas import UserResponse
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import or_
+from sqlalchemy import or_, case
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
+async def bump_token_version(scope: SessionScope, user_id: int):
+    """Отзыв выданных токенов пользователя: новая версия попадает в снимок только после commit"""
+    version = await token_versions.bump(scope.session, user_id)
+    scope.after_commit(lambda: token_versions.remember(user_id, version))
+
+
 class UsersDAO(BaseDAO):
     model = Users
 
     @classmethod
-    async def add(cls, username: str, firstname: str, email: str, hashed_password: str):
-        async with async_session_maker() as session:
+    async def on_write(cls, scope: SessionScope, model_id: int):
+        await bump_token_version(scope, model_id)
+
+    @classmethod
+    def on_change(cls, model_id: int):
+        user_cache.invalidate(model_id)
+        analytics_ingestor.forget_author(model_id)
+
+    @classmethod
+    async def add(cls, username: str, firstname: str, email: str, hashed_password: str,
+                  session: Optional[AsyncSession] = None):
+        async with SessionScope(session) as scope:
             try:
                 new_user = Users(
                     username=username,
@@ -26,17 +45,18 @@ class UsersDAO(BaseDAO):
                     email=email,
                     hashed_password=hashed_password
                 )
-                session.add(new_user)
-                await session.commit()
+                scope.session.add(new_user)
+                await scope.commit()
                 return new_user
             except SQLAlchemyError as e:
-                await session.rollback()
+                await scope.rollback()
                 logger.warning(f"Ошибка при добавлении пользователя: {e}")
                 raise
 
     @classmethod
-    async def find_by_username_or_email(cls, username: Optional[str] = None, email: Optional[str] = None):
-        async with async_session_maker() as session:
+    async def find_by_username_or_email(cls, username: Optional[str] = None, email: Optional[str] = None,
+                                        session: Optional[AsyncSession] = None):
+        async with SessionScope(session) as scope:
             try:
                 query = select(cls.model)
                 if username and email:
@@ -45,7 +65,7 @@ class UsersDAO(BaseDAO):
                     query = query.where(cls.model.username == username)
                 elif email:
                     query = query.where(cls.model.email == email)
-                result = await session.execute(query)
+                result = await scope.session.execute(query)
                 user = result.scalar()
                 return user
             except SQLAlchemyError as e:
@@ -53,11 +73,40 @@ class UsersDAO(BaseDAO):
                 raise
 
     @classmethod
-    async def get_user_with_roles(cls, user_id: int) -> Optional[UserResponse]:
-        async with async_session_maker() as session:
+    async def find_for_login(cls, email: Optional[str] = None, username: Optional[str] = None,
+                             session: Optional[AsyncSession] = None) -> Optional[Users]:
+        """Пользователь с ролями по email или имени одним запросом, совпадение по email в приоритете"""
+        conditions = []
+        if email:
+            conditions.append(Users.email == email)
+        if username:
+            conditions.append(Users.username == username)
+        if not conditions:
+            return None
+
+        async with SessionScope(session) as scope:
+            try:
+                query = (
+                    select(Users)
+                    .options(joinedload(Users.roles))
+                    .where(or_(*conditions))
+                    .order_by(case((Users.email == email, 0), else_=1) if email else Users.id)
+                    .limit(1)
+                )
+                result = await scope.session.execute(query)
+                return result.unique().scalar_one_or_none()
+            except SQLAlchemyError as e:
+                logger.warning(f"Ошибка при поиске пользователя для входа: {e}")
+                raise
+
+    @classmethod
+    async def get_user_with_roles(cls, user_id: int, session: Optional[AsyncSession] = None) -> Optional[UserResponse]:
+        async with SessionScope(session) as scope:
             try:
-                result = await session.execute(
+                result = await scope.session.execute(
                     select(Users).options(selectinload(Users.roles)).where(Users.id == user_id)
+                    # В общей сессии роли могли измениться после загрузки пользователя
+                    .execution_options(populate_existing=True)
                 )
                 user = result.scalar_one_or_none()
 
@@ -78,11 +127,11 @@ class UsersDAO(BaseDAO):
                 raise
 
     @classmethod
-    async def get_user_by_email(cls, email: str):
-        async with async_session_maker() as session:
+    async def get_user_by_email(cls, email: str, session: Optional[AsyncSession] = None):
+        async with SessionScope(session) as scope:
             try:
                 query = select(cls.model).filter_by(email=email)
-                result = await session.execute(query)
+                result = await scope.session.execute(query)
                 user = result.scalar_one_or_none()
                 return user
             except SQLAlchemyError as e:
@@ -91,11 +140,12 @@ class UsersDAO(BaseDAO):
 
     @classmethod
     async def update(cls, model_id: int, username: Optional[str] = None, email: Optional[str] = None,
-                     hashed_password: Optional[str] = None, firstname: Optional[str] = None):
-        async with async_session_maker() as session:
+                     hashed_password: Optional[str] = None, firstname: Optional[str] = None,
+                     session: Optional[AsyncSession] = None):
+        async with SessionScope(session) as scope:
             try:
                 stmt = select(Users).where(Users.id == model_id)
-                result = await session.execute(stmt)
+                result = await scope.session.execute(stmt)
                 user = result.scalar()
 
                 if not user:
@@ -111,12 +161,14 @@ class UsersDAO(BaseDAO):
                 if firstname is not None:
                     user.firstname = firstname
 
-                await session.commit()
+                await cls.on_write(scope, model_id)
+                scope.after_commit(lambda: cls.on_change(model_id))
+                await scope.commit()
                 return user
 
             except SQLAlchemyError as e:
                 logger.warning(f"Ошибка при обновлении пользователя с id={model_id}: {e}")
-                await session.rollback()
+                await scope.rollback()
                 raise
 
 
@@ -124,10 +176,10 @@ class UsersRolesDAO(BaseDAO):
     model = Roles
 
     @classmethod
-    async def add(cls, user_id: int, role_name: str):
-        async with async_session_maker() as session:
+    async def add(cls, user_id: int, role_name: str, session: Optional[AsyncSession] = None):
+        async with SessionScope(session) as scope:
             try:
-                role = await session.execute(
+                role = await scope.session.execute(
                     select(Roles).where(Roles.name == role_name)
                 )
                 role = role.scalar_one_or_none()
@@ -135,70 +187,71 @@ class UsersRolesDAO(BaseDAO):
                 if not role:
                     raise ValueError("Роль не найдена")
 
-                existing_association = await session.execute(
-                    select(role_user_association).where(
-                        (role_user_association.c.user_id == user_id) &
-                        (role_user_association.c.role_id == role.id)
-                    )
+                result = await scope.session.execute(
+                    pg_insert(role_user_association)
+                    .values(user_id=user_id, role_id=role.id)
+                    .on_conflict_do_nothing()
                 )
-                if existing_association.fetchone():
-                    return
-
-                stmt = insert(role_user_association).values(user_id=user_id, role_id=role.id)
-                await session.execute(stmt)
-                await session.commit()
+                if result.rowcount:
+                    await bump_token_version(scope, user_id)
+                    scope.after_commit(lambda: user_cache.invalidate(user_id))
+                await scope.commit()
 
             except SQLAlchemyError as e:
-                await session.rollback()
+                await scope.rollback()
                 logger.warning(f"Ошибка при добавлении роли {role_name} пользователю с id={user_id}: {e}")
                 raise
 
     @classmethod
-    async def clear_roles(cls, user_id: int):
-        async with async_session_maker() as session:
+    async def clear_roles(cls, user_id: int, session: Optional[AsyncSession] = None):
+        async with SessionScope(session) as scope:
             try:
-                await session.execute(
+                await scope.session.execute(
                     delete(role_user_association).where(
                         role_user_association.c.user_id == user_id
                     )
                 )
-                await session.commit()
+                await bump_token_version(scope, user_id)
+                scope.after_commit(lambda: user_cache.invalidate(user_id))
+                await scope.commit()
 
             except SQLAlchemyError as e:
-                await session.rollback()
+                await scope.rollback()
                 logger.warning(f"Ошибка при удалении ролей у пользователя с id={user_id}: {e}")
                 raise
 
     @classmethod
-    async def add_roles(cls, user_id: int, role_names: List[str]):
-        async with async_session_maker() as session:
+    async def add_roles(cls, user_id: int, role_names: List[str], session: Optional[AsyncSession] = None):
+        """Назначение ролей двумя запросами: выбор ролей по IN и вставка связей с ON CONFLICT DO NOTHING"""
+        role_names = list(dict.fromkeys(role_names))
+        if not role_names:
+            return
+
+        async with SessionScope(session) as scope:
             try:
-                for role_name in role_names:
-                    role = await session.execute(
-                        select(Roles).where(Roles.name == role_name)
-                    )
-                    role = role.scalar_one_or_none()
+                result = await scope.session.execute(
+                    select(Roles.id, Roles.name).where(Roles.name.in_(role_names))
+                )
+                roles = {row.name: row.id for row in result.all()}
 
-                    if not role:
+                for role_name in role_names:
+                    if role_name not in roles:
                         logger.warning(f"Роль {role_name} не найдена")
-                        continue
 
-                    existing_association = await session.execute(
-                        select(role_user_association).where(
-                            (role_user_association.c.user_id == user_id) &
-                            (role_user_association.c.role_id == role.id)
-                        )
+                if roles:
+                    result = await scope.session.execute(
+                        pg_insert(role_user_association)
+                        .values([{"user_id": user_id, "role_id": role_id} for role_id in roles.values()])
+                        .on_conflict_do_nothing()
                     )
-                    if existing_association.fetchone():
-                        continue
-
-                    stmt = insert(role_user_association).values(user_id=user_id, role_id=role.id)
-                    await session.execute(stmt)
+                    if result.rowcount:
+                        await bump_token_version(scope, user_id)
+                        scope.after_commit(lambda: user_cache.invalidate(user_id))
 
-                await session.commit()
+                await scope.commit()
 
             except SQLAlchemyError as e:
-                await session.rollback()
+                await scope.rollback()
                 logger.warning(f"Ошибка при добавлении ролей пользователю с id={user_id}: {e}")
                 raise
 
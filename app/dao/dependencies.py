@@ -1,9 +1,13 @@
+from dataclasses import dataclass, field
 from datetime import datetime
+from typing import List, Optional, Set, Union
 from fastapi import Request, Depends, Response, HTTPException
 from jose import jwt, JWTError
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
+from app.auth.token_versions import token_versions
 from app.config import settings
+from app.dao.user_cache import user_cache
 from app.database import async_session_maker
 from app.exceptions import (
     TokenAbsentException,
@@ -25,8 +29,16 @@ def get_token(request: Request) -> str:
     return token
 
 
-async def get_current_user(response: Response, token: str = Depends(get_token)):
-    """Проверяем токен и получаем текущего пользователя."""
+@dataclass(frozen=True)
+class TokenUser:
+    """Пользователь, восстановленный из проверенных claims токена без обращения к БД"""
+    id: int
+    username: Optional[str]
+    roles: List[str] = field(default_factory=list)
+
+
+def decode_access_token(token: str) -> dict:
+    """Проверяет подпись и срок действия токена, возвращает payload с числовым sub."""
     if not token:
         logger.warning("Токен отсутствует.")
         raise TokenAbsentException
@@ -47,10 +59,26 @@ async def get_current_user(response: Response, token: str = Depends(get_token)):
         logger.warning("Идентификатор пользователя не найден в токене.")
         raise UserIsNotPresentException
 
+    try:
+        payload["sub"] = int(user_id)
+    except (TypeError, ValueError):
+        logger.warning(f"Некорректный идентификатор пользователя в токене: {user_id}")
+        raise UserIsNotPresentException
+
+    return payload
+
+
+async def load_user(user_id: int) -> Users:
+    """Пользователь с ролями из кэша или БД."""
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    cache_version = user_cache.version
     async with async_session_maker() as session:
         try:
             result = await session.execute(
-                select(Users).options(selectinload(Users.roles)).where(Users.id == int(user_id))
+                select(Users).options(selectinload(Users.roles)).where(Users.id == user_id)
             )
             user = result.scalar_one_or_none()
 
@@ -58,28 +86,61 @@ async def get_current_user(response: Response, token: str = Depends(get_token)):
                 logger.warning(f"Пользователь с идентификатором {user_id} не найден.")
                 raise UserIsNotPresentException
 
+            user_cache.set(user.id, user, version=cache_version)
+
             return user
         except Exception as e:
             logger.warning(f"Необработанная ошибка при получении пользователя: {e}")
             raise ErrorGettingUser
 
 
-async def get_current_admin_user(current_user: Users = Depends(get_current_user)) -> Users:
+async def get_current_user(response: Response, token: str = Depends(get_token)):
+    """Проверяем токен и получаем текущего пользователя."""
+    payload = decode_access_token(token)
+    return await load_user(payload["sub"])
+
+
+async def get_authorized_user(token: str = Depends(get_token)) -> Union[Users, TokenUser]:
+    """Пользователь для проверки ролей.
+
+    В режиме AUTH_MODE="claims" роли берутся из токена, если его версия не устарела,
+    иначе (и в режиме "database") пользователь с ролями загружается как в get_current_user.
+    """
+    payload = decode_access_token(token)
+    user_id = payload["sub"]
+    roles = payload.get("roles")
+
+    if settings.AUTH_MODE == "claims" and isinstance(roles, list) \
+            and token_versions.is_current(user_id, payload.get("ver")):
+        return TokenUser(id=user_id, username=payload.get("username"), roles=roles)
+
+    return await load_user(user_id)
+
+
+def role_names(user: Union[Users, TokenUser]) -> Set[str]:
+    if isinstance(user, TokenUser):
+        return set(user.roles)
+    return {role.name for role in user.roles}
+
+
+async def get_current_admin_user(current_user: Union[Users, TokenUser] = Depends(get_authorized_user)):
     """Проверяет, является ли текущий пользователь администратором."""
-    if not current_user or not any(role.name == "admin" for role in current_user.roles):
+    if not current_user or "admin" not in role_names(current_user):
         logger.warning("Пользователь не является администратором.")
         raise PermissionDeniedException
 
     return current_user
 
 
-async def get_current_admin_or_moderator_user(current_user: Users = Depends(get_current_user)) -> tuple[Users, str]:
+async def get_current_admin_or_moderator_user(
+        current_user: Union[Users, TokenUser] = Depends(get_authorized_user)
+) -> tuple[Union[Users, TokenUser], str]:
     """Проверяем, является ли текущий пользователь администратором или модератором и возвращает его роль."""
     if not current_user:
         logger.warning("Пользователь не авторизован.")
         raise PermissionDeniedException
 
-    roles = {role.name for role in current_user.roles}
+    roles = role_names(current_user)
     if "admin" in roles:
         return current_user, "admin"
     elif "moderator" in roles:
@@ -0,0 +1,64 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+from app.config import settings
+from app.users.models import Users
+
+
+class UserCache:
+    """Ограниченный по размеру кэш пользователей с ролями с временем жизни записей.
+
+    Хранит отсоединенные от сессии объекты Users с загруженными ролями, чтобы
+    get_current_user не обращался к БД на каждом запросе. Записи сбрасываются
+    DAO при изменении пользователя или его ролей. Кэш локален для процесса:
+    в других воркерах изменения становятся видны не позже чем через ttl секунд.
+    """
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[int, tuple[float, Users]]" = OrderedDict()
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        """Счетчик сбросов. Загрузка, начатая до сброса, не должна попасть в кэш"""
+        return self._version
+
+    def get(self, user_id: int) -> Optional[Users]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+
+        expires_at, user = entry
+        if expires_at <= time.monotonic():
+            del self._entries[user_id]
+            return None
+
+        self._entries.move_to_end(user_id)
+        return user
+
+    def set(self, user_id: int, user: Users, version: Optional[int] = None):
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        if version is not None and version != self._version:
+            return
+
+        self._entries[user_id] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        self._version += 1
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        self._version += 1
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+user_cache = UserCache(ttl=settings.USER_CACHE_TTL, maxsize=settings.USER_CACHE_MAXSIZE)
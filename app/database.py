@@ -1,11 +1,30 @@
+import time
+from typing import List
 from sqlalchemy.exc import OperationalError, SQLAlchemyError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from app.config import settings
 from app.exceptions import DatabaseExceptions, DatabaseConnectionLost
+from app.logger.logger import logger
 
 
-engine = create_async_engine(settings.DATABASE_URL, echo=False)
+def engine_options() -> dict:
+    """Параметры пула и кэша подготовленных выражений из настроек"""
+    return {
+        "echo": False,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": {
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE,
+        },
+    }
+
+
+engine = create_async_engine(settings.DATABASE_URL, **engine_options())
 
 
 async_session_maker = sessionmaker(
@@ -18,6 +37,72 @@ async_session_maker = sessionmaker(
 async_session_maker: sessionmaker[AsyncSession]
 
 
+class ReplicaRouter:
+    """Выбор сессии для чтения: реплики по кругу, при их недоступности - основная БД.
+
+    Реплика, к которой не удалось подключиться, пропускается retry_interval секунд.
+    Записи всегда идут через async_session_maker основной БД.
+    """
+
+    def __init__(self, urls: List[str], retry_interval: float):
+        self.engines = [create_async_engine(url, **engine_options()) for url in urls]
+        self.session_makers = [
+            sessionmaker(bind=replica_engine, class_=AsyncSession, expire_on_commit=False)
+            for replica_engine in self.engines
+        ]
+        self.retry_interval = retry_interval
+        self._next = 0
+        self._down_until = [0.0] * len(self.engines)
+
+    def _candidates(self) -> List[int]:
+        count = len(self.engines)
+        start, self._next = self._next, (self._next + 1) % count if count else 0
+        now = time.monotonic()
+        return [index for index in ((start + offset) % count for offset in range(count))
+                if self._down_until[index] <= now]
+
+    async def open_session(self) -> AsyncSession:
+        for index in self._candidates():
+            session = self.session_makers[index]()
+            try:
+                await session.connection()
+                return session
+            except (SQLAlchemyError, OSError) as e:
+                await session.close()
+                self._down_until[index] = time.monotonic() + self.retry_interval
+                logger.warning(f"Реплика БД #{index} недоступна, чтение переключено: {e}")
+        return async_session_maker()
+
+
+replica_router = ReplicaRouter(settings.REPLICA_DATABASE_URLS, settings.DB_REPLICA_RETRY_INTERVAL)
+
+
+async def read_session() -> AsyncSession:
+    """Сессия только для чтения вне зависимостей FastAPI (например, в потоковой выгрузке)"""
+    return await replica_router.open_session()
+
+
+def pool_stats(target_engine) -> dict:
+    pool = target_engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        # QueuePool считает overflow от -size, пока постоянные соединения не открыты
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "timeout": settings.DB_POOL_TIMEOUT,
+    }
+
+
+def get_pool_stats() -> dict:
+    """Текущее состояние пула соединений процесса"""
+    stats = {"primary": pool_stats(engine)}
+    for index, replica_engine in enumerate(replica_router.engines):
+        stats[f"replica_{index}"] = pool_stats(replica_engine)
+    return stats
+
+
 async def get_db() -> AsyncSession:
     try:
         async with async_session_maker() as session:
@@ -28,5 +113,16 @@ async def get_db() -> AsyncSession:
         raise DatabaseExceptions(f"Ошибка ORM: {str(e)}")
 
 
+async def get_read_db() -> AsyncSession:
+    """Сессия для эндпоинтов только на чтение: реплика или основная БД"""
+    try:
+        async with await read_session() as session:
+            yield session
+    except OperationalError as e:
+        raise DatabaseConnectionLost(f"База данные потеряла соединение: {str(e)}")
+    except SQLAlchemyError as e:
+        raise DatabaseExceptions(f"Ошибка ORM: {str(e)}")
+
+
 class Base(DeclarativeBase):
     pass
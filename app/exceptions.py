@@ -365,3 +365,23 @@ class QuestionSearchNotFound(HootLineException):
     detail = "Вопрос не найден"
 
 
+
+
+class InvalidPaginationCursor(HootLineException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    detail = "Некорректный курсор пагинации"
+
+
+class AnalyticsQueueIsFull(HootLineException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    detail = "Очередь записи аналитики переполнена, повторите запрос позже."
+
+
+class InvalidAnalyticsRange(HootLineException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    detail = "Начало диапазона должно быть раньше его конца"
+
+
+class PasswordHashingOverloaded(HootLineException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    detail = "Сервер перегружен проверкой паролей, повторите попытку позже."
@@ -1,6 +1,10 @@
-import html
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+import atexit
+import copy
 import logging
+import queue
+import threading
+import time
 import requests
 from pythonjsonlogger import jsonlogger
 from datetime import datetime
@@ -12,45 +16,205 @@ TELEGRAM_TOKEN = settings.TELEGRAM_TOKEN
 CHAT_ID = settings.CHAT_ID
 
 
+LOG_TIMEZONE = pytz.timezone('Asia/Yekaterinburg')
+
+
 class CustomJsonFormatter(jsonlogger.JsonFormatter):
     def __init__(self, *args, **kwargs):
         kwargs['json_ensure_ascii'] = False
         super().__init__(*args, **kwargs)
+        # (секунда, строка): метка времени форматируется один раз в секунду
+        self._timestamp_cache = (None, None)
+
+    def _timestamp(self, created: float) -> str:
+        second = int(created)
+        cached_second, cached_timestamp = self._timestamp_cache
+        if cached_second != second:
+            cached_timestamp = datetime.fromtimestamp(second, LOG_TIMEZONE).strftime("%Y-%m-%d %H:%M:%S")
+            self._timestamp_cache = (second, cached_timestamp)
+        return cached_timestamp
 
     def add_fields(self, log_record, record, message_dict):
         super().add_fields(log_record, record, message_dict)
 
         if not log_record.get("timestamp"):
-            tz = pytz.timezone('Asia/Yekaterinburg')
-            log_record["timestamp"] = datetime.now(tz).strftime("%Y-%m-%d %H:%M:%S")
+            # Время события, а не момента записи потоком QueueListener
+            log_record["timestamp"] = self._timestamp(record.created)
 
         level = log_record.get("level") or record.levelname
         log_record["level"] = level.upper() if level else "NOTSET"
 
 
+class LogQueueHandler(QueueHandler):
+    """Постановка записи в очередь без форматирования.
+
+    Стандартный prepare() форматирует запись и вставляет traceback в текст
+    сообщения; здесь только фиксируется текст сообщения с аргументами, а
+    JSON со всеми полями и exc_info строит CustomJsonFormatter в потоке QueueListener.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
 class TelegramHandler(logging.Handler):
-    """Кастомный логгер для отправки сообщений в Telegram"""
-    def __init__(self, token, chat_id, level=logging.ERROR):
+    """Кастомный логгер для отправки сообщений в Telegram.
+
+    emit только кладет отформатированную запись в ограниченную очередь, при ее
+    переполнении запись отбрасывается и учитывается в счетчике dropped. Фоновый
+    поток собирает записи за batch_interval секунд, схлопывает одинаковые,
+    склеивает их в сообщения до лимита Telegram и отправляет не чаще одного раза
+    в min_send_interval секунд с таймаутом timeout на запрос.
+    """
+
+    MESSAGE_LIMIT = 4096
+    MAX_BATCH = 200
+
+    def __init__(self, token, chat_id, level=logging.ERROR, api_url="https://api.telegram.org",
+                 queue_size=1000, batch_interval=2.0, min_send_interval=3.0, timeout=5.0):
         super().__init__(level)
         self.token = token
         self.chat_id = chat_id
+        self.api_url = api_url.rstrip("/")
+        self.batch_interval = batch_interval
+        self.min_send_interval = min_send_interval
+        self.timeout = timeout
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self._reported_dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._session = requests.Session()
+        self._last_sent = 0.0
+
+    def _ensure_thread(self):
+        # Поток запускается при первой записи, чтобы пережить fork воркеров
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="telegram-log-sender", daemon=True)
+                self._thread.start()
 
     def emit(self, record):
-        log_entry = self.format(record)
-        log_entry = html.escape(log_entry)
         try:
-            url = f"https://api.telegram.org/bot{self.token}/sendMessage"
-            payload = {"chat_id": self.chat_id, "text": log_entry, "parse_mode": "HTML"}
-            response = requests.post(url, json=payload)
+            log_entry = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+
+        if self._stop.is_set():
+            return
+
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(log_entry)
+        except queue.Full:
+            with self._thread_lock:
+                self.dropped += 1
 
-            response.raise_for_status()
-        except Exception as e:
-            print(f"Ошибка при отправке сообщения в Telegram: {e}")
+    def _collect(self) -> list:
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + (0 if self._stop.is_set() else self.batch_interval)
+        while len(batch) < self.MAX_BATCH:
+            try:
+                remaining = deadline - time.monotonic()
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _build_messages(self, batch: list) -> list:
+        """Схлопывание одинаковых записей и склейка в сообщения не длиннее MESSAGE_LIMIT"""
+        counts = {}
+        for log_entry in batch:
+            counts[log_entry] = counts.get(log_entry, 0) + 1
+
+        entries = [
+            log_entry if count == 1 else f"{log_entry}\n(повторов: {count})"
+            for log_entry, count in counts.items()
+        ]
+
+        with self._thread_lock:
+            dropped = self.dropped - self._reported_dropped
+            self._reported_dropped = self.dropped
+        if dropped:
+            entries.append(f"Отброшено сообщений из-за переполнения очереди: {dropped}")
+
+        messages, current = [], ""
+        for entry in entries:
+            entry = entry[:self.MESSAGE_LIMIT]
+            if current and len(current) + 2 + len(entry) > self.MESSAGE_LIMIT:
+                messages.append(current)
+                current = entry
+            else:
+                current = f"{current}\n\n{entry}" if current else entry
+        if current:
+            messages.append(current)
+        return messages
+
+    def _send(self, text: str):
+        delay = self._last_sent + self.min_send_interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        url = f"{self.api_url}/bot{self.token}/sendMessage"
+        # Текст отправляется без parse_mode, поэтому экранирование не требуется
+        payload = {"chat_id": self.chat_id, "text": text}
+        for _ in range(2):
+            try:
+                response = self._session.post(url, json=payload, timeout=self.timeout)
+                self._last_sent = time.monotonic()
+                if response.status_code == 429:
+                    retry_after = response.json().get("parameters", {}).get("retry_after", 1)
+                    time.sleep(min(float(retry_after), 60.0))
+                    continue
+                response.raise_for_status()
+                self.sent += 1
+                return
+            except Exception as e:
+                # Не через logger, чтобы не зациклить отправку ошибок
+                print(f"Ошибка при отправке сообщения в Telegram: {e}")
+                break
+        self.failed += 1
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._collect()
+            if not batch:
+                continue
+            for message in self._build_messages(batch):
+                self._send(message)
+
+    def stats(self) -> dict:
+        return {"queued": self._queue.qsize(), "sent": self.sent, "failed": self.failed, "dropped": self.dropped}
+
+    def close(self):
+        """Отправка накопленных записей и остановка потока"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.batch_interval + 2 * (self.timeout + self.min_send_interval))
+        super().close()
 
 
 telegram_handler = TelegramHandler(
     token=settings.TELEGRAM_TOKEN,
     chat_id=settings.CHAT_ID,
+    api_url=settings.TELEGRAM_API_URL,
+    queue_size=settings.TELEGRAM_QUEUE_SIZE,
+    batch_interval=settings.TELEGRAM_BATCH_INTERVAL,
+    min_send_interval=settings.TELEGRAM_MIN_SEND_INTERVAL,
+    timeout=settings.TELEGRAM_TIMEOUT,
 )
 
 
@@ -65,8 +229,21 @@ fileHandler.setFormatter(formatter)
 streamHandler = logging.StreamHandler()
 streamHandler.setFormatter(formatter)
 
+# Запись в файл, stdout и Telegram выполняет поток QueueListener,
+# вызов логгера в обработчиках запросов только ставит запись в очередь
+log_queue = queue.SimpleQueue()
+queue_handler = LogQueueHandler(log_queue)
+queue_listener = QueueListener(
+    log_queue,
+    fileHandler,
+    streamHandler,
+    telegram_handler,
+    respect_handler_level=True,
+)
+queue_listener.start()
+# Регистрируется после logging, поэтому при выходе очередь дописывается до закрытия обработчиков
+atexit.register(queue_listener.stop)
+
 logger = logging.getLogger()
-logger.addHandler(fileHandler)
-logger.addHandler(streamHandler)
-logger.addHandler(telegram_handler)
+logger.addHandler(queue_handler)
 logger.setLevel(settings.LOG_LEVEL)
@@ -1,72 +1,127 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
+import random
 import time
+from starlette.datastructures import Headers, URL
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from app.config import settings
 from app.logger.logger import logger
 
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
+class BodySample:
+    """Первые max_bytes байт тела, остальное только проходит мимо"""
 
-        # Логируем запрос
-        log_request_data = {
-            "event": "request",
-            "method": request.method,
-            "url": str(request.url),
-            "headers": dict(request.headers),
-        }
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.chunks = []
+        self.size = 0
 
-        try:
-            request_body = await request.body()
-            if request_body:
-                log_request_data["body"] = request_body.decode("utf-8")[:500]
-        except Exception as e:
-            log_request_data["body_error"] = f"Failed to read request body: {str(e)}"
+    def feed(self, chunk: bytes):
+        if chunk and self.size < self.max_bytes:
+            part = chunk[:self.max_bytes - self.size]
+            self.chunks.append(part)
+            self.size += len(part)
 
+    def text(self) -> str:
+        # Обрезка по байтам может разрезать многобайтовый символ
+        return b"".join(self.chunks).decode("utf-8", errors="ignore")
 
-        logger.info("Incoming request", extra=log_request_data)
 
-        try:
-            response = await call_next(request)
+class LoggingMiddleware:
+    """Логирование запросов и ответов на уровне ASGI.
+
+    Тела запроса и ответа не буферизуются: сообщения передаются дальше без
+    задержки, а для лога копируются только первые max_body_bytes байт.
+    Логируется доля sample_rate запросов, пути из excluded_paths пропускаются.
+    """
+
+    def __init__(self, app: ASGIApp, sample_rate: float = None, excluded_paths=None, max_body_bytes: int = None):
+        self.app = app
+        self.sample_rate = settings.LOG_REQUEST_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.excluded_paths = tuple(settings.LOG_EXCLUDED_PATH_PREFIXES if excluded_paths is None else excluded_paths)
+        self.max_body_bytes = settings.LOG_BODY_MAX_BYTES if max_body_bytes is None else max_body_bytes
+
+    def _should_log(self, path: str) -> bool:
+        if self.excluded_paths and path.startswith(self.excluded_paths):
+            return False
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
 
-            log_response_data = {
-                "event": "response",
-                "status_code": response.status_code,
-                "headers": dict(response.headers),
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self._should_log(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.time()
+        method = scope["method"]
+        url = str(URL(scope=scope))
+        request_body = BodySample(self.max_body_bytes)
+        response_body = BodySample(self.max_body_bytes)
+        log_response_data = {}
+        request_logged = False
+        response_started = False
+
+        def log_request():
+            nonlocal request_logged
+            if request_logged:
+                return
+            request_logged = True
+
+            # Логируем запрос
+            log_request_data = {
+                "event": "request",
+                "method": method,
+                "url": url,
+                "headers": dict(Headers(scope=scope)),
             }
+            if request_body.size:
+                log_request_data["body"] = request_body.text()
+            logger.info("Incoming request", extra=log_request_data)
 
-            response_body = b""
-            try:
-                async for chunk in response.body_iterator:
-                    response_body += chunk
-                if response_body:
-                    log_response_data["body"] = response_body.decode("utf-8")[:500]
-            except Exception as e:
-                log_response_data["body_error"] = f"Failed to read response body: {str(e)}"
+        async def receive_wrapper() -> Message:
+            message = await receive()
+            if message["type"] == "http.request":
+                request_body.feed(message.get("body", b""))
+                if not message.get("more_body", False):
+                    log_request()
+            return message
 
-            async def body_generator():
-                yield response_body
+        async def send_wrapper(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                # Обработчик мог не читать тело запроса
+                log_request()
+                response_started = True
+                log_response_data.update({
+                    "event": "response",
+                    "status_code": message["status"],
+                    "headers": dict(Headers(raw=message.get("headers", []))),
+                })
+            elif message["type"] == "http.response.body":
+                response_body.feed(message.get("body", b""))
+            await send(message)
 
-            response.body_iterator = body_generator()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
 
+            if response_body.size:
+                log_response_data["body"] = response_body.text()
             logger.info("Response sent", extra=log_response_data)
-
-            return response
         except Exception as e:
+            log_request()
             logger.error("Error occurred", extra={
                 "event": "error",
-                "message": str(e),
-                "method": request.method,
-                "url": str(request.url),
+                "error": str(e),
+                "method": method,
+                "url": url,
             })
-            return Response(content="Internal Server Error", status_code=500)
+            if response_started:
+                raise
+            await PlainTextResponse("Internal Server Error", status_code=500)(scope, receive, send)
         finally:
             process_time = time.time() - start_time
             logger.info("Request handling time", extra={
                 "event": "process_time",
-                "method": request.method,
-                "url": str(request.url),
+                "method": method,
+                "url": url,
                 "process_time": process_time,
             })
@@ -10,10 +10,16 @@ from app.logger.middleware import LoggingMiddleware
 from app.admin.pagination_and_filtration import router_pagination, router_filter
 from app.users.router import router_users
 from app.auth.router import router_auth
+from app.auth.password_hashing import password_hasher
+from app.auth.token_versions import token_versions
 from app.admin.router import router_admin
+from app.analytics.ingestion import analytics_ingestor
+from app.analytics.partitions import analytics_partition_maintainer
 from app.analytics.router import router_analytics
 from app.questions.router_question import router_question
 from app.questions.router_categories import router_categories
+from app.questions.search_index import question_search_index
+from app.questions.view_counter import question_view_counter
 from app.utils import init_roles
 from app.logger.logger import logger
 
@@ -21,9 +27,20 @@ from app.logger.logger import logger
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     await init_roles()
+    await token_versions.start()
+    await question_search_index.start()
+    question_view_counter.start()
+    await analytics_partition_maintainer.start()
+    await analytics_ingestor.start()
     yield
+    await analytics_ingestor.stop()
+    await analytics_partition_maintainer.stop()
+    await question_view_counter.stop()
+    await question_search_index.stop()
+    await token_versions.stop()
+    password_hasher.shutdown()
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI()
 
 app.include_router(router_users)
 app.include_router(router_auth)
@@ -36,7 +53,9 @@ app.include_router(router_analytics)
 
 app = VersionedFastAPI(app,
                        version_format='{major}',
-                       prefix_format='/v{major}')
+                       prefix_format='/v{major}',
+                       # Lifespan вложенных приложений не вызывается, поэтому передаем его родительскому
+                       lifespan=lifespan)
 
 origins = [
     "http://localhost:8080",
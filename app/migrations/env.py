@@ -10,7 +10,7 @@ from alembic import context
 sys.path.insert(0, dirname(dirname(dirname(abspath(__file__)))))
 from app.config import settings
 from app.database import Base, get_db
-from app.users.models import Users, Roles, Permissions
+from app.users.models import Users, Roles, Permissions, UserTokenVersion
 from app.questions.models import Question, Category
 from app.analytics.models import Analytics
 
@@ -0,0 +1,48 @@
+"""FTS trigger for questions
+
+Revision ID: 5c1e7a9d3f42
+Revises: a567df114967
+Create Date: 2026-10-16 10:10:12.418305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1e7a9d3f42'
+down_revision = 'a567df114967'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE questions ADD COLUMN IF NOT EXISTS tsv_content tsvector")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_questions_tsv_content ON questions USING gin (tsv_content)")
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION questions_tsv_content_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.tsv_content :=
+                setweight(to_tsvector('russian', coalesce(NEW.text, '')), 'A') ||
+                setweight(to_tsvector('russian', coalesce(NEW.answer, '')), 'B');
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER questions_tsv_content_trigger
+        BEFORE INSERT OR UPDATE OF text, answer ON questions
+        FOR EACH ROW EXECUTE FUNCTION questions_tsv_content_update()
+    """)
+
+    op.execute("""
+        UPDATE questions SET tsv_content =
+            setweight(to_tsvector('russian', coalesce(text, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(answer, '')), 'B')
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS questions_tsv_content_trigger ON questions")
+    op.execute("DROP FUNCTION IF EXISTS questions_tsv_content_update()")
@@ -0,0 +1,35 @@
+"""Add trgm indexes
+
+Revision ID: 9b4d2e6f8a17
+Revises: 5c1e7a9d3f42
+Create Date: 2026-10-16 11:35:40.102957
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b4d2e6f8a17'
+down_revision = '5c1e7a9d3f42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index('ix_questions_text_trgm', 'questions', ['text'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'text': 'gin_trgm_ops'})
+    op.create_index('ix_questions_answer_trgm', 'questions', ['answer'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'answer': 'gin_trgm_ops'})
+    op.create_index('ix_sub_questions_text_trgm', 'sub_questions', ['text'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'text': 'gin_trgm_ops'})
+    op.create_index('ix_sub_questions_answer_trgm', 'sub_questions', ['answer'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'answer': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sub_questions_answer_trgm', table_name='sub_questions', postgresql_using='gin')
+    op.drop_index('ix_sub_questions_text_trgm', table_name='sub_questions', postgresql_using='gin')
+    op.drop_index('ix_questions_answer_trgm', table_name='questions', postgresql_using='gin')
+    op.drop_index('ix_questions_text_trgm', table_name='questions', postgresql_using='gin')
@@ -0,0 +1,30 @@
+"""Keyset indexes for questions
+
+Revision ID: 71f0c2d94b6e
+Revises: e3a8c51b7d09
+Create Date: 2026-10-16 16:05:27.804113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '71f0c2d94b6e'
+down_revision = 'e3a8c51b7d09'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_questions_top_number_keyset', 'questions',
+                    [sa.text('coalesce(number, 0)'), 'id'], unique=False,
+                    postgresql_where=sa.text('parent_question_id IS NULL'))
+    op.create_index('ix_questions_top_updated_at_keyset', 'questions',
+                    [sa.text("coalesce(updated_at, '1970-01-01 00:00:00+00'::timestamptz)"), 'id'], unique=False,
+                    postgresql_where=sa.text('parent_question_id IS NULL'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_questions_top_updated_at_keyset', table_name='questions')
+    op.drop_index('ix_questions_top_number_keyset', table_name='questions')
@@ -0,0 +1,54 @@
+"""Analytics hourly and daily rollups
+
+Revision ID: c4f1a7e2b9d5
+Revises: 71f0c2d94b6e
+Create Date: 2026-10-17 09:30:12.418305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f1a7e2b9d5'
+down_revision = '71f0c2d94b6e'
+branch_labels = None
+depends_on = None
+
+ROLLUPS = {
+    'analytics_hourly': 'hour',
+    'analytics_daily': 'day',
+}
+
+
+def upgrade() -> None:
+    for table, unit in ROLLUPS.items():
+        op.create_table(
+            table,
+            sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+            sa.Column('question_id', sa.Integer(), server_default='0', nullable=False),
+            sa.Column('subquestion_id', sa.Integer(), server_default='0', nullable=False),
+            sa.Column('author', sa.String(), server_default='', nullable=False),
+            sa.Column('count', sa.Integer(), server_default='0', nullable=False),
+            sa.PrimaryKeyConstraint('bucket', 'question_id', 'subquestion_id', 'author'),
+        )
+        op.create_index(f'ix_{table}_question_id_bucket', table, ['question_id', 'bucket'], unique=False)
+
+        # Заполнение агрегатов по уже накопленным событиям
+        op.execute(f"""
+            INSERT INTO {table} (bucket, question_id, subquestion_id, author, count)
+            SELECT date_trunc('{unit}', created_at AT TIME ZONE 'Asia/Yekaterinburg') AT TIME ZONE 'Asia/Yekaterinburg',
+                   coalesce(question_id, 0),
+                   coalesce(subquestion_id, 0),
+                   coalesce(author, ''),
+                   count(*)
+            FROM analytics
+            WHERE created_at IS NOT NULL
+            GROUP BY 1, 2, 3, 4
+        """)
+
+
+def downgrade() -> None:
+    for table in ROLLUPS:
+        op.drop_index(f'ix_{table}_question_id_bucket', table_name=table)
+        op.drop_table(table)
@@ -0,0 +1,94 @@
+"""Partition analytics by month
+
+Revision ID: 8d2b6f0e4a93
+Revises: c4f1a7e2b9d5
+Create Date: 2026-10-17 11:15:40.207716
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2b6f0e4a93'
+down_revision = 'c4f1a7e2b9d5'
+branch_labels = None
+depends_on = None
+
+# Партиции создаются от месяца самого раннего события до текущего + PARTITIONS_AHEAD,
+# дальше их поддерживает AnalyticsPartitionMaintainer
+PARTITIONS_AHEAD = 3
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE analytics RENAME TO analytics_legacy")
+    op.execute("ALTER INDEX IF EXISTS analytics_pkey RENAME TO analytics_legacy_pkey")
+    op.execute("DROP INDEX IF EXISTS ix_analytics_id")
+
+    op.execute("""
+        CREATE TABLE analytics (
+            id integer NOT NULL DEFAULT nextval('analytics_id_seq'),
+            question_id integer,
+            subquestion_id integer,
+            author varchar,
+            created_at timestamptz NOT NULL DEFAULT now(),
+            CONSTRAINT analytics_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("ALTER SEQUENCE analytics_id_seq OWNED BY analytics.id")
+    op.execute("CREATE INDEX ix_analytics_created_at_brin ON analytics USING brin (created_at)")
+    op.execute("CREATE INDEX ix_analytics_question_id ON analytics (question_id)")
+
+    op.execute(f"""
+        DO $$
+        DECLARE
+            part_month timestamp;
+            last_month timestamp := date_trunc('month', now() AT TIME ZONE 'Asia/Yekaterinburg')
+                                    + interval '{PARTITIONS_AHEAD} months';
+        BEGIN
+            part_month := coalesce(
+                (SELECT date_trunc('month', min(created_at) AT TIME ZONE 'Asia/Yekaterinburg') FROM analytics_legacy),
+                date_trunc('month', now() AT TIME ZONE 'Asia/Yekaterinburg')
+            );
+            WHILE part_month <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF analytics FOR VALUES FROM (%L) TO (%L)',
+                    'analytics_y' || to_char(part_month, 'YYYY') || 'm' || to_char(part_month, 'MM'),
+                    part_month AT TIME ZONE 'Asia/Yekaterinburg',
+                    (part_month + interval '1 month') AT TIME ZONE 'Asia/Yekaterinburg'
+                );
+                part_month := part_month + interval '1 month';
+            END LOOP;
+        END $$
+    """)
+
+    # События без времени создания относятся к моменту миграции
+    op.execute("""
+        INSERT INTO analytics (id, question_id, subquestion_id, author, created_at)
+        SELECT id, question_id, subquestion_id, author, coalesce(created_at, now())
+        FROM analytics_legacy
+    """)
+    op.execute("DROP TABLE analytics_legacy")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE analytics RENAME TO analytics_partitioned")
+    op.execute("ALTER INDEX analytics_pkey RENAME TO analytics_partitioned_pkey")
+    op.execute("""
+        CREATE TABLE analytics (
+            id integer NOT NULL DEFAULT nextval('analytics_id_seq'),
+            question_id integer,
+            subquestion_id integer,
+            author varchar,
+            created_at timestamptz,
+            CONSTRAINT analytics_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute("ALTER SEQUENCE analytics_id_seq OWNED BY analytics.id")
+    op.execute("CREATE INDEX ix_analytics_id ON analytics (id)")
+    op.execute("""
+        INSERT INTO analytics (id, question_id, subquestion_id, author, created_at)
+        SELECT id, question_id, subquestion_id, author, created_at
+        FROM analytics_partitioned
+    """)
+    # Партиции удаляются вместе с родительской таблицей
+    op.execute("DROP TABLE analytics_partitioned")
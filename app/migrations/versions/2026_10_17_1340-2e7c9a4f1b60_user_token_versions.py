@@ -0,0 +1,28 @@
+"""User token versions
+
+Revision ID: 2e7c9a4f1b60
+Revises: 8d2b6f0e4a93
+Create Date: 2026-10-17 13:40:05.611482
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2e7c9a4f1b60'
+down_revision = '8d2b6f0e4a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('user_token_versions',
+    sa.Column('user_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('version', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user_token_versions')
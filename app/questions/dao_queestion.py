@@ -1,6 +1,7 @@
 import traceback
+from collections import defaultdict
 from datetime import datetime
-from typing import List
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
 from fastapi import HTTPException
 from app.exceptions import CategoryNotFound, ForASubquestionYouMustSpecifyParentQuestionId, \
     FailedToCreateQuestionDynamic, ParentQuestionIDNotFound, IncorrectParentSubquestionIdValueNumberExpected, \
@@ -9,9 +10,12 @@ from app.exceptions import CategoryNotFound, ForASubquestionYouMustSpecifyParent
 from app.logger.logger import logger
 from app.questions.models import Question, SubQuestion
 from app.questions.schemas import QuestionCreate, SubQuestionCreate, SubQuestionResponse, QuestionResponse, \
-    UpdateQuestionRequest
+    UpdateQuestionRequest, QuestionResponseForPagination, QuestionCursorSort
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, Select, func, literal_column, type_coerce
+from sqlalchemy.orm import noload
+from app.database import read_session
+from app.questions.search_index import question_search_index
 from app.questions.utils import get_category_by_id
 
 
@@ -55,6 +59,8 @@ class QuestionService:
             new_question.number = new_question.id
             await db.commit()
 
+            question_search_index.upsert(new_question)
+
             return new_question
 
         except Exception as e:
@@ -164,45 +170,179 @@ async def build_subquestion_response(sub_question: SubQuestion) -> SubQuestionRe
     )
 
 
+def build_sub_question_responses(sub_questions: Iterable[SubQuestion]) -> List[SubQuestionResponse]:
+    """Плоский список ответов по уже загруженным подвопросам"""
+    return [
+        SubQuestionResponse(
+            id=sub_question.id,
+            author=sub_question.author,
+            author_edit=sub_question.author_edit,
+            text=sub_question.text,
+            answer=sub_question.answer,
+            number=sub_question.number,
+            count=sub_question.count,
+            parent_question_id=sub_question.parent_question_id,
+            depth=sub_question.depth,
+            created_at=sub_question.created_at,
+            updated_at=sub_question.updated_at,
+            category_id=sub_question.category_id,
+            subcategory_id=sub_question.subcategory_id,
+            parent_subquestion_id=sub_question.parent_subquestion_id,
+            sub_questions=[]
+        )
+        for sub_question in sub_questions
+    ]
+
+
 async def get_sub_questions(db: AsyncSession, parent_question_id: int) -> List[SubQuestionResponse]:
     try:
         result = await db.execute(select(SubQuestion).where(SubQuestion.parent_question_id == parent_question_id))
         sub_questions = result.scalars().all()
 
-        sub_question_responses = [
-            SubQuestionResponse(
-                id=sub_question.id,
-                author=sub_question.author,
-                author_edit=sub_question.author_edit,
-                text=sub_question.text,
-                answer=sub_question.answer,
-                number=sub_question.number,
-                count=sub_question.count,
-                parent_question_id=sub_question.parent_question_id,
-                depth=sub_question.depth,
-                created_at=sub_question.created_at,
-                updated_at=sub_question.updated_at,
-                category_id=sub_question.category_id,
-                subcategory_id=sub_question.subcategory_id,
-                parent_subquestion_id=sub_question.parent_subquestion_id,
-                sub_questions=[]
-            )
-            for sub_question in sub_questions
-        ]
-
-        return sub_question_responses
+        return build_sub_question_responses(sub_questions)
     except Exception as e:
         logger.warning(f"Ошибка в get_sub_questions: {e}")
         raise
 
 
-def build_subquestions_hierarchy(sub_questions, parent_question_id=None):
-    hierarchy = []
-    for sub_question in sub_questions:
-        if sub_question.parent_subquestion_id == parent_question_id:
-            sub_question.sub_questions = build_subquestions_hierarchy(sub_questions, sub_question.id)
-            hierarchy.append(sub_question)
-    return hierarchy
+def build_subquestions_hierarchy(sub_questions: Iterable[SubQuestionResponse],
+                                 parent_question_id: Optional[int] = None) -> List[SubQuestionResponse]:
+    """Сборка дерева подвопросов за линейное время.
+
+    Дочерние узлы индексируются по parent_subquestion_id за один проход.
+    Переданные объекты не изменяются: дерево собирается из их копий.
+    """
+    nodes = [sub_question.model_copy(update={"sub_questions": []}) for sub_question in sub_questions]
+
+    children: Dict[Optional[int], List[SubQuestionResponse]] = defaultdict(list)
+    for node in nodes:
+        children[node.parent_subquestion_id].append(node)
+
+    for node in nodes:
+        node.sub_questions = children.get(node.id, [])
+
+    return children.get(parent_question_id, [])
+
+
+def build_question_tree_response(question: Question,
+                                 sub_questions: Optional[List[SubQuestionResponse]] = None) -> QuestionResponse:
+    """Ответ по вопросу с деревом подвопросов.
+
+    Если подвопросы не переданы, берутся из загруженной связи question.sub_questions.
+    """
+    if sub_questions is None:
+        sub_questions = build_sub_question_responses(question.sub_questions)
+
+    return QuestionResponse(
+        id=question.id,
+        author=question.author,
+        author_edit=question.author_edit,
+        created_at=question.created_at,
+        updated_at=question.updated_at,
+        text=question.text,
+        category_id=question.category_id,
+        subcategory_id=question.subcategory_id,
+        answer=question.answer,
+        number=question.number,
+        depth=question.depth,
+        count=question.count,
+        parent_question_id=question.parent_question_id,
+        sub_questions=build_subquestions_hierarchy(sub_questions)
+    )
+
+
+def question_list_filters(query: Optional[str] = None,
+                          category_id: Optional[int] = None,
+                          subcategory_id: Optional[int] = None) -> list:
+    """Условия выборки вопросов верхнего уровня для списков с пагинацией"""
+    filters = [Question.parent_question_id.is_(None)]
+    if query:
+        filters.append(Question.text.ilike(f"%{query}%"))
+
+    if category_id is not None:
+        filters.append(Question.category_id == category_id)
+
+    if subcategory_id is not None:
+        filters.append(Question.subcategory_id == subcategory_id)
+
+    return filters
+
+
+def question_cursor_order(sort: QuestionCursorSort) -> Tuple[list, bool]:
+    """Ключ курсорной сортировки и её направление.
+
+    Выражения совпадают с индексами ix_questions_top_number_keyset и
+    ix_questions_top_updated_at_keyset, NULL заменяется константой, чтобы
+    сравнение кортежей было корректным.
+    """
+    if sort == QuestionCursorSort.UPDATED_AT:
+        updated_at = func.coalesce(Question.updated_at, literal_column("'1970-01-01 00:00:00+00'::timestamptz"))
+        return [type_coerce(updated_at, Question.updated_at.type), Question.id], True
+
+    return [func.coalesce(Question.number, literal_column("0")), Question.id], False
+
+
+def build_question_pagination_response(question: Question, has_sub_questions: bool) -> QuestionResponseForPagination:
+    """Строка списка вопросов; is_depth вычисляется в запросе через EXISTS по подвопросам"""
+    return QuestionResponseForPagination(
+        id=question.id,
+        author=question.author,
+        author_edit=question.author_edit,
+        created_at=question.created_at,
+        updated_at=question.updated_at,
+        text=question.text,
+        category_id=question.category_id,
+        subcategory_id=question.subcategory_id,
+        answer=question.answer,
+        number=question.number,
+        depth=question.depth,
+        count=question.count,
+        parent_question_id=question.parent_question_id,
+        sub_questions=[],
+        is_depth=bool(question.depth > 0 or has_sub_questions)
+    )
+
+
+async def get_question_trees(db: AsyncSession, questions_stmt: Select) -> List[QuestionResponse]:
+    """Массовая загрузка вопросов с деревьями подвопросов.
+
+    Два запроса: вопросы и все их подвопросы одним IN (...), деревья собираются в памяти.
+    """
+    result = await db.execute(questions_stmt.options(noload(Question.sub_questions)))
+    questions = result.scalars().all()
+    if not questions:
+        return []
+
+    sub_result = await db.execute(
+        select(SubQuestion).where(SubQuestion.parent_question_id.in_([question.id for question in questions]))
+    )
+
+    grouped: Dict[int, List[SubQuestionResponse]] = defaultdict(list)
+    for sub_question in build_sub_question_responses(sub_result.scalars().all()):
+        grouped[sub_question.parent_question_id].append(sub_question)
+
+    return [build_question_tree_response(question, grouped.get(question.id, [])) for question in questions]
+
+
+async def stream_question_trees(batch_size: int = 500) -> AsyncIterator[str]:
+    """Выгрузка всех вопросов в формате NDJSON пачками по batch_size.
+
+    Пачки выбираются по ключу id (WHERE id > последний), поэтому в памяти
+    одновременно находится только одна пачка. Сессия открывается внутри
+    генератора, так как зависимости FastAPI закрываются до отправки тела ответа.
+    """
+    last_id = 0
+    async with await read_session() as session:
+        while True:
+            stmt = select(Question).where(Question.id > last_id).order_by(Question.id).limit(batch_size)
+            batch = await get_question_trees(session, stmt)
+            if not batch:
+                break
+
+            yield "".join(f"{question.model_dump_json()}\n" for question in batch)
+
+            last_id = batch[-1].id
+            session.expunge_all()
 
 
 async def update_sub_question(update_request: UpdateQuestionRequest, db: AsyncSession):
@@ -229,6 +369,8 @@ async def update_main_question(update_request: UpdateQuestionRequest, db: AsyncS
 
     await db.commit()
 
+    question_search_index.upsert(question)
+
 
 def update_fields(question_obj, update_request: UpdateQuestionRequest):
     """Обновление полей text, answer и author"""
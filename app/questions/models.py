@@ -1,5 +1,6 @@
 from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
-from sqlalchemy.orm import relationship, backref
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, backref, deferred
 from datetime import datetime, timezone
 from app.database import Base
 import pytz
@@ -33,6 +34,12 @@ class Category(Base):
 
 class Question(Base):
     __tablename__ = "questions"
+    __table_args__ = (
+        Index('ix_questions_tsv_content', 'tsv_content', postgresql_using='gin'),
+        Index('ix_questions_text_trgm', 'text', postgresql_using='gin', postgresql_ops={'text': 'gin_trgm_ops'}),
+        Index('ix_questions_answer_trgm', 'answer', postgresql_using='gin',
+              postgresql_ops={'answer': 'gin_trgm_ops'}),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     text = Column(String, index=True)
@@ -43,6 +50,8 @@ class Question(Base):
     count = Column(Integer, nullable=True)
     parent_question_id = Column(Integer, ForeignKey('questions.id', name='fk_questions_parent_id'), nullable=True)
     depth = Column(Integer, nullable=False, default=0)
+    # Заполняется триггером questions_tsv_content_trigger (конфигурация russian)
+    tsv_content = deferred(Column(TSVECTOR, nullable=True))
 
     author = Column(String, nullable=True)
     author_edit = Column(String, nullable=True)
@@ -62,9 +71,14 @@ class Question(Base):
 
 class SubQuestion(Base):
     __tablename__ = "sub_questions"
+    __table_args__ = (
+        Index('ix_sub_questions_text_trgm', 'text', postgresql_using='gin', postgresql_ops={'text': 'gin_trgm_ops'}),
+        Index('ix_sub_questions_answer_trgm', 'answer', postgresql_using='gin',
+              postgresql_ops={'answer': 'gin_trgm_ops'}),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    parent_question_id = Column(Integer, ForeignKey('questions.id', name='fk_subquestions_question_id'))
+    parent_question_id = Column(Integer, ForeignKey('questions.id', name='fk_subquestions_question_id'), index=True)
     category_id = Column(Integer, ForeignKey('categories.id', name='fk_subquestions_category_id'), nullable=True)
     subcategory_id = Column(Integer, ForeignKey('categories.id', name='fk_subquestions_subcategory_id'), nullable=True)
     text = Column(String, index=True)
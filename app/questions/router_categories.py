@@ -6,7 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from sqlalchemy.exc import IntegrityError
 from app.dao.dependencies import get_current_user, get_current_admin_or_moderator_user, get_current_admin_user
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.exceptions import ErrorGettingCategories, CategoryWithTheSameNameAlreadyExists, ErrorCreatingCategory, \
     ParentCategoryNotFound, FailedTGetDataFromDatabase, CategoryWithSameNameAlreadyExists, ErrorUpdatingCategories, \
     FailedToUpdateCategories, CategoryNotFound, CategoryContainsSubcategoriesDeletionIsNotPossible, \
@@ -27,7 +27,7 @@ router_categories = APIRouter(
 
 @router_categories.get("", response_model=List[CategoryResponse], summary="Получить все категории")
 @version(1)
-async def get_categories(db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
+async def get_categories(db: AsyncSession = Depends(get_read_db), current_user=Depends(get_current_user)):
     """Отобразить все категории имеющиеся в Базе данных"""
     try:
         logger.debug("Выполнение запроса для получения корневых категорий с parent_id == None")
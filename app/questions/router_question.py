@@ -1,4 +1,3 @@
-import asyncio
 import io
 import os
 import time
@@ -6,29 +5,36 @@ import traceback
 from PIL import Image
 from typing import List, Optional
 from fastapi_versioning import version
-from fastapi import APIRouter, Depends, File, HTTPException, status, UploadFile
-from fastapi_pagination import Page, paginate
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, File, HTTPException, Query, status, UploadFile
+from fastapi.responses import StreamingResponse
+from fastapi_pagination import Page
+from fastapi_pagination.ext.sqlalchemy import paginate as sqlalchemy_paginate
+from sqlalchemy import select, exists
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import selectinload
-from app.admin.pagination_and_filtration import CustomParams
+from sqlalchemy.orm import noload
+from app.admin.pagination_and_filtration import CustomParams, KeysetPage, keyset_paginate, DEFAULT_PAGE_SIZE, \
+    MAX_PAGE_SIZE
 from app.dao.dependencies import get_current_admin_or_moderator_user, get_current_user
-from app.database import get_db, async_session_maker
+from app.database import get_db, get_read_db, read_session
 from app.exceptions import QuestionNotFound, ErrorInGetQuestions, \
     ErrorInGetQuestionWithSubquestions, SubQuestionNotFound, TheSubQuestionDoesNotBelongToTheSpecifiedMainQuestion, \
     CannotDeleteSubQuestionWithNestedSubQuestions, QuestionOrSubQuestionSuccessfullyDeleted, ErrorWhenDeletingQuestion, \
     SubQuestionSuccessfullyUpdated, QuestionSuccessfullyUpdated, ErrorWhenUpdatingQuestion, ErrorSearchingQuestions, \
-    ErrorReceivingDataForDashboard, ErrorWhileSaving, QuestionSearchNotFound
+    ErrorReceivingDataForDashboard, ErrorWhileSaving, QuestionSearchNotFound, InvalidPaginationCursor
 from app.logger.logger import logger
-from app.questions.dao_queestion import build_question_response, QuestionService, get_sub_questions, \
-    build_subquestions_hierarchy, build_subquestion_response, update_main_question, update_sub_question
+from app.questions.dao_queestion import build_question_response, QuestionService, \
+    build_subquestion_response, update_main_question, update_sub_question, \
+    build_question_tree_response, get_question_trees, stream_question_trees, build_question_pagination_response, \
+    question_list_filters, question_cursor_order
 from app.questions.models import Question, SubQuestion
 from app.questions.schemas import QuestionResponse, QuestionCreate, DeleteQuestionRequest, UpdateQuestionRequest, \
-    QuestionIDRequest, QuestionResponseForPagination, QuestionSearchResponse
+    QuestionIDRequest, QuestionResponseForPagination, QuestionSearchResponse, SearchMode, QuestionCursorSort
 from pydantic import ValidationError
 from sqlalchemy import func
-from app.questions.search_questions import build_question_response_from_search, QuestionSearchService
+from app.questions.search_index import question_search_index
+from app.questions.search_questions import QuestionSearchService
+from app.questions.view_counter import question_view_counter
 
 router_question = APIRouter(
     prefix="/question",
@@ -38,43 +44,22 @@ router_question = APIRouter(
 
 @router_question.get("/all-questions", response_model=List[QuestionResponse])
 @version(1)
-async def get_questions(db: AsyncSession = Depends(get_db),
+async def get_questions(db: AsyncSession = Depends(get_read_db),
                         current_user=Depends(get_current_user)):
     try:
-        result = await db.execute(select(Question))
-        questions = result.scalars().all()
-
-        tasks = [get_sub_questions(db, question.id) for question in questions]
-        sub_questions_list = await asyncio.gather(*tasks)
-
-        question_responses = []
-        for question, sub_questions in zip(questions, sub_questions_list):
-            hierarchical_sub_questions = build_subquestions_hierarchy(sub_questions)
-
-            question_response = QuestionResponse(
-                id=question.id,
-                author=question.author,
-                author_edit=question.author_edit,
-                created_at=question.created_at,
-                updated_at=question.updated_at,
-                text=question.text,
-                category_id=question.category_id,
-                subcategory_id=question.subcategory_id,
-                answer=question.answer,
-                number=question.number,
-                depth=question.depth,
-                count=question.count,
-                parent_question_id=question.parent_question_id,
-                sub_questions=hierarchical_sub_questions
-            )
-            question_responses.append(question_response)
-
-        return question_responses
+        return await get_question_trees(db, select(Question).order_by(Question.id))
     except Exception as e:
         logger.warning(f"Ошибка в get_questions: {e}")
         raise ErrorInGetQuestions(detail=str(e))
 
 
+@router_question.get("/all-questions/stream", summary="Выгрузка всех вопросов в формате NDJSON")
+@version(1)
+async def stream_questions(current_user=Depends(get_current_user)):
+    """Потоковая выгрузка каталога: по одному вопросу с деревом подвопросов на строку"""
+    return StreamingResponse(stream_question_trees(), media_type="application/x-ndjson")
+
+
 @router_question.get("/pagination-questions",
                      status_code=status.HTTP_200_OK,
                      response_model=Page[QuestionResponseForPagination],
@@ -87,44 +72,71 @@ async def get_all_questions_or_search(params: CustomParams = Depends(),
                                       current_user=Depends(get_current_user)):
     """Получение всех вопросов верхнего уровня с пагинацией и поиском"""
     try:
-        async with async_session_maker() as session:
-            stmt = select(Question).filter(Question.parent_question_id.is_(None))
-            if query:
-                stmt = stmt.filter(Question.text.ilike(f"%{query}%"))
-
-            if category_id is not None:
-                stmt = stmt.filter(Question.category_id == category_id)
-
-            if subcategory_id is not None:
-                stmt = stmt.filter(Question.subcategory_id == subcategory_id)
-
-            stmt = stmt.options(selectinload(Question.sub_questions))
-
-            result = await session.execute(stmt)
-            question_all = result.scalars().all()
-
-        question_responses = [
-            QuestionResponseForPagination(
-                id=question.id,
-                author=question.author,
-                author_edit=question.author_edit,
-                created_at=question.created_at,
-                updated_at=question.updated_at,
-                text=question.text,
-                category_id=question.category_id,
-                subcategory_id=question.subcategory_id,
-                answer=question.answer,
-                number=question.number,
-                depth=question.depth,
-                count=question.count,
-                parent_question_id=question.parent_question_id,
-                sub_questions=[],
-                is_depth=True if question.depth > 0 or question.sub_questions else False
+        filters = question_list_filters(query, category_id, subcategory_id)
+        has_sub_questions = exists().where(SubQuestion.parent_question_id == Question.id).label("has_sub_questions")
+
+        stmt = (
+            select(Question, has_sub_questions)
+            .where(*filters)
+            .options(noload(Question.sub_questions))
+            .order_by(Question.number, Question.id)
+        )
+        count_stmt = select(func.count()).select_from(Question).where(*filters)
+
+        async with await read_session() as session:
+            return await sqlalchemy_paginate(
+                session,
+                stmt,
+                params,
+                count_query=count_stmt,
+                transformer=lambda rows: [
+                    build_question_pagination_response(question, has_sub_questions)
+                    for question, has_sub_questions in rows
+                ],
             )
-            for question in question_all
-        ]
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router_question.get("/cursor-questions",
+                     status_code=status.HTTP_200_OK,
+                     response_model=KeysetPage[QuestionResponseForPagination],
+                     summary="Вопросы верхнего уровня с курсорной пагинацией")
+@version(1)
+async def get_questions_by_cursor(cursor: Optional[str] = None,
+                                  size: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                                  sort: QuestionCursorSort = QuestionCursorSort.NUMBER,
+                                  query: Optional[str] = None,
+                                  category_id: Optional[int] = None,
+                                  subcategory_id: Optional[int] = None,
+                                  current_user=Depends(get_current_user)):
+    """Вопросы для бесконечной прокрутки: по number или по updated_at (сначала новые).
+    Курсор следующей страницы - next_cursor."""
+    try:
+        has_sub_questions = exists().where(SubQuestion.parent_question_id == Question.id).label("has_sub_questions")
+        order_by, descending = question_cursor_order(sort)
+
+        stmt = (
+            select(Question, has_sub_questions)
+            .where(*question_list_filters(query, category_id, subcategory_id))
+            .options(noload(Question.sub_questions))
+        )
 
-        return paginate(question_responses, params=params)
+        async with await read_session() as session:
+            rows, next_cursor = await keyset_paginate(
+                session,
+                stmt,
+                order_by=order_by,
+                cursor=cursor,
+                size=size,
+                scope=f"questions:{sort.value}",
+                descending=descending,
+            )
+
+        items = [build_question_pagination_response(question, has_sub_questions) for question, has_sub_questions in rows]
+        return KeysetPage[QuestionResponseForPagination](items=items, size=size, next_cursor=next_cursor)
+    except InvalidPaginationCursor as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
@@ -146,33 +158,10 @@ async def get_question_with_subquestions(
         if not question:
             raise QuestionNotFound
 
-        if question.count is None:
-            question.count = 1
-        else:
-            question.count += 1
+        question_view_counter.increment(question_id)
 
-        await db.commit()
-
-        sub_questions = await get_sub_questions(db, question_id)
-
-        hierarchical_sub_questions = build_subquestions_hierarchy(sub_questions)
-
-        question_response = QuestionResponse(
-            id=question.id,
-            author=question.author,
-            author_edit=question.author_edit,
-            created_at=question.created_at,
-            updated_at=question.updated_at,
-            text=question.text,
-            category_id=question.category_id,
-            subcategory_id=question.subcategory_id,
-            answer=question.answer,
-            depth=question.depth,
-            number=question.number,
-            count=question.count,
-            parent_question_id=question.parent_question_id,
-            sub_questions=hierarchical_sub_questions
-        )
+        question_response = build_question_tree_response(question)
+        question_response.count = (question.count or 0) + question_view_counter.pending(question_id)
 
         return question_response
 
@@ -256,6 +245,10 @@ async def delete_question(
             await db.delete(question)
 
         await db.commit()
+
+        if id_to_delete <= 0:
+            question_search_index.remove(main_question_id)
+
         return QuestionOrSubQuestionSuccessfullyDeleted
     except Exception as e:
         await db.rollback()
@@ -289,25 +282,25 @@ async def update_question(
 @version(1)
 async def search_questions(
         query: str,
-        db: AsyncSession = Depends(get_db),
+        mode: SearchMode = SearchMode.FTS,
+        params: CustomParams = Depends(),
+        db: AsyncSession = Depends(get_read_db),
         current_user=Depends(get_current_user)
 ):
-    """Поиск вопросов по тексту"""
+    """Поиск вопросов по тексту: полнотекстовый (fts), по подстроке (ilike) или по триграммам (similarity)"""
     try:
         questions = await QuestionSearchService.search_questions(
             db,
             query,
+            mode=mode,
+            limit=params.size,
+            offset=(params.page - 1) * params.size,
         )
 
         if not questions:
             return []
 
-        question_dict = {question.id: question for question in questions}
-
-        question_responses = [
-            await build_question_response_from_search(question, db) for question in questions if
-            question.parent_question_id is None
-        ]
+        question_responses = [build_question_tree_response(question) for question in questions]
 
         return question_responses
     except Exception as e:
@@ -319,7 +312,7 @@ async def search_questions(
 @version(1)
 async def search_questions(
     query: str,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user=Depends(get_current_user),
 ):
     try:
@@ -1,4 +1,5 @@
 from datetime import datetime
+from enum import Enum
 
 from pydantic import BaseModel, Field, RootModel
 from typing import Optional, List
@@ -165,6 +166,17 @@ class QuestionResponseForPagination(BaseModel):
         from_attributes = True
 
 
+class SearchMode(str, Enum):
+    ILIKE = "ilike"
+    FTS = "fts"
+    SIMILARITY = "similarity"
+
+
+class QuestionCursorSort(str, Enum):
+    NUMBER = "number"
+    UPDATED_AT = "updated_at"
+
+
 class MatchPosition(BaseModel):
     field: str
     start: int
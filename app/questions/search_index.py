@@ -0,0 +1,178 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from rapidfuzz import fuzz, process
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.database import async_session_maker
+from app.logger.logger import logger
+from app.questions.models import Question
+from app.questions.utils import normalize
+
+
+@dataclass(frozen=True)
+class IndexedQuestion:
+    """Предварительно нормализованные поля вопроса для нечеткого поиска"""
+    id: int
+    content: str
+    text: str
+    answer: str
+
+
+class QuestionSearchIndex:
+    """Резидентный индекс нормализованных вопросов.
+
+    Загружается при старте приложения и обновляется точечно при создании,
+    изменении и удалении вопросов, поэтому поисковый запрос тратит время только
+    на оценку совпадений. Индекс локален для процесса: при запуске нескольких
+    воркеров каждый держит свою копию, поэтому фоновая задача раз в
+    refresh_interval секунд сверяет отпечаток таблицы (число строк, max(id),
+    max(updated_at)) и перезагружает индекс, если вопросы менялись в другом воркере.
+    """
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self._entries: Dict[int, IndexedQuestion] = {}
+        self._snapshot: Optional[Tuple[List[int], List[str]]] = None
+        self._fingerprint: Optional[Tuple[Any, ...]] = None
+        self._task: Optional[asyncio.Task] = None
+        self.loaded = False
+
+    @staticmethod
+    def _make_entry(question: Question) -> IndexedQuestion:
+        text = question.text or ""
+        answer = question.answer or ""
+        return IndexedQuestion(
+            id=question.id,
+            content=normalize(f"{text} {answer}"),
+            text=normalize(text),
+            answer=normalize(answer),
+        )
+
+    async def load(self, db: Optional[AsyncSession] = None):
+        """Полная загрузка индекса из базы данных"""
+        if db is None:
+            async with async_session_maker() as session:
+                return await self.load(session)
+
+        # Отпечаток читается до строк: изменение между запросами вызовет повторную загрузку
+        fingerprint = await self._read_fingerprint(db)
+        result = await db.execute(select(Question.id, Question.text, Question.answer))
+        entries = {row.id: self._make_entry(row) for row in result.all()}
+
+        self._entries = entries
+        self._snapshot = None
+        self._fingerprint = fingerprint
+        self.loaded = True
+        logger.info(f"Поисковый индекс вопросов загружен: {len(entries)} записей")
+
+    @staticmethod
+    async def _read_fingerprint(db: AsyncSession) -> Tuple[Any, ...]:
+        result = await db.execute(
+            select(func.count(Question.id), func.max(Question.id), func.max(Question.updated_at))
+        )
+        return tuple(result.one())
+
+    async def refresh(self):
+        """Перезагрузка индекса, если таблица вопросов изменилась с последней загрузки"""
+        async with async_session_maker() as session:
+            if await self._read_fingerprint(session) != self._fingerprint:
+                await self.load(session)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Не удалось обновить поисковый индекс вопросов: {e}")
+
+    async def start(self):
+        if self._task is None:
+            await self.load()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def upsert(self, question: Question):
+        """Добавление или обновление вопроса в индексе"""
+        self._entries[question.id] = self._make_entry(question)
+        self._snapshot = None
+
+    def remove(self, question_id: int):
+        """Удаление вопроса из индекса"""
+        if self._entries.pop(question_id, None) is not None:
+            self._snapshot = None
+
+    def get(self, question_id: int) -> Optional[IndexedQuestion]:
+        return self._entries.get(question_id)
+
+    def snapshot(self) -> Tuple[List[int], List[str]]:
+        """Неизменяемый срез корпуса: идентификаторы и нормализованный текст.
+
+        Пересобирается лениво после изменений, чтобы поиск не копировал корпус
+        на каждом запросе.
+        """
+        if self._snapshot is None:
+            ids = list(self._entries.keys())
+            corpus = [self._entries[question_id].content for question_id in ids]
+            self._snapshot = (ids, corpus)
+        return self._snapshot
+
+    @staticmethod
+    def search(
+            snapshot: Tuple[List[int], List[str]],
+            queries: Sequence[str],
+            threshold: int = 75,
+            top_n: int = 5
+    ) -> List[Tuple[int, float, str]]:
+        """Оценка всех вариантов запроса по срезу корпуса одним матричным вызовом.
+
+        Блокирующая операция, задействует все ядра (workers=-1), поэтому
+        вызывается вне event loop со срезом, полученным через snapshot().
+        Возвращает (id вопроса, процент совпадения, сработавший запрос)
+        по убыванию процента, без дублей.
+        """
+        question_ids, corpus = snapshot
+        if not corpus or not queries:
+            return []
+
+        scores = process.cdist(
+            queries,
+            corpus,
+            scorer=fuzz.partial_ratio,
+            score_cutoff=threshold,
+            workers=-1,
+        )
+
+        limit = min(top_n, len(corpus))
+        matches: Dict[int, Tuple[int, float, str]] = {}
+
+        for row, search_query in enumerate(queries):
+            row_scores = scores[row]
+            # Частичная выборка top-N без полной сортировки строки
+            candidates = np.argpartition(row_scores, -limit)[-limit:]
+            for position in candidates:
+                score = float(row_scores[position])
+                if score <= 0 or score < threshold:
+                    continue
+                question_id = question_ids[position]
+                if question_id not in matches or score > matches[question_id][1]:
+                    matches[question_id] = (question_id, score, search_query)
+
+        return sorted(matches.values(), key=lambda match: match[1], reverse=True)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+question_search_index = QuestionSearchIndex(refresh_interval=settings.SEARCH_INDEX_REFRESH_INTERVAL)
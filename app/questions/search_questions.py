@@ -1,29 +1,32 @@
-import re
+import asyncio
 import torch
 from pydantic import BaseModel, Field
 from typing import Optional, List
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.orm import selectinload
 from app.logger.logger import logger
-from app.questions.models import Question, SubQuestion
-from app.questions.schemas import QuestionResponse, SubQuestionResponse, QuestionSearchResponse
-from sqlalchemy import or_
-from rapidfuzz import fuzz, process
+from app.questions.dao_queestion import build_sub_question_responses, build_subquestions_hierarchy
+from app.questions.models import Question
+from app.questions.schemas import QuestionSearchResponse, SearchMode
+from app.questions.search_index import question_search_index
+from app.questions.utils import normalize
+from sqlalchemy import or_, func, cast, literal, String
+from sqlalchemy.dialects.postgresql import REGCONFIG
 from transformers import AutoTokenizer, AutoModel
 
 # tokenizer = AutoTokenizer.from_pretrained("DeepPavlov/rubert-base-cased-sentence")
 # model = AutoModel.from_pretrained("DeepPavlov/rubert-base-cased-sentence")
 
 
+FTS_CONFIG = "russian"
+
+
 class SearchQuestionRequest(BaseModel):
     query: str = Field(..., description="Текст для поиска")
     category_id: Optional[int] = Field(None, description="ID категории для фильтрации")
 
 
-def normalize(text: str) -> str:
-    return re.sub(r"\s+", " ", text.strip().lower())
-
-
 def is_latin(text: str) -> bool:
     return all(ord(c) < 128 for c in text)  # Проверка, являются ли все символы латиницей
 
@@ -61,13 +64,93 @@ class QuestionSearchService:
     async def search_questions(
             db: AsyncSession,
             query: str,
+            mode: SearchMode = SearchMode.FTS,
+            limit: int = 10,
+            offset: int = 0,
+    ) -> List[Question]:
+        """Поиск вопросов верхнего уровня с пагинацией на стороне БД"""
+        if mode == SearchMode.FTS:
+            return await QuestionSearchService.search_questions_fts(db, query, limit=limit, offset=offset)
+
+        if mode == SearchMode.SIMILARITY:
+            return await QuestionSearchService.search_questions_similarity(db, query, limit=limit, offset=offset)
+
+        stmt = (
+            select(Question)
+            .options(selectinload(Question.sub_questions))
+            .where(
+                Question.parent_question_id.is_(None),
+                or_(
+                    Question.text.ilike(f"%{query}%"),
+                    Question.answer.ilike(f"%{query}%")
+                )
+            )
+            .order_by(Question.id)
+            .limit(limit)
+            .offset(offset)
+        )
+
+        result = await db.execute(stmt)
+        return result.scalars().all()
+
+    @staticmethod
+    async def search_questions_fts(
+            db: AsyncSession,
+            query: str,
+            limit: int = 10,
+            offset: int = 0,
+    ) -> List[Question]:
+        """Полнотекстовый поиск по tsv_content (GIN) с ранжированием ts_rank"""
+        ts_query = func.websearch_to_tsquery(cast(FTS_CONFIG, REGCONFIG), query)
+        rank = func.ts_rank(Question.tsv_content, ts_query)
+
+        stmt = (
+            select(Question)
+            .options(selectinload(Question.sub_questions))
+            .where(
+                Question.parent_question_id.is_(None),
+                Question.tsv_content.op("@@")(ts_query)
+            )
+            .order_by(rank.desc(), Question.id)
+            .limit(limit)
+            .offset(offset)
+        )
+
+        result = await db.execute(stmt)
+        return result.scalars().all()
+
+    @staticmethod
+    async def search_questions_similarity(
+            db: AsyncSession,
+            query: str,
+            limit: int = 10,
+            offset: int = 0,
     ) -> List[Question]:
+        """Поиск по триграммам (pg_trgm) с ранжированием по степени сходства.
+
+        Текст вопроса сравнивается целиком (similarity, оператор %), ответ -
+        по лучшему совпадающему фрагменту (word_similarity, оператор <%).
+        Оба условия обслуживаются GIN-индексами gin_trgm_ops.
+        """
+        search_term = literal(query, String)
+        rank = func.greatest(
+            func.similarity(Question.text, search_term),
+            func.word_similarity(search_term, Question.answer),
+        )
 
-        stmt = select(Question).where(
-            or_(
-                Question.text.ilike(f"%{query}%"),
-                Question.answer.ilike(f"%{query}%")
+        stmt = (
+            select(Question)
+            .options(selectinload(Question.sub_questions))
+            .where(
+                Question.parent_question_id.is_(None),
+                or_(
+                    Question.text.op("%")(search_term),
+                    search_term.op("<%")(Question.answer)
+                )
             )
+            .order_by(rank.desc(), Question.id)
+            .limit(limit)
+            .offset(offset)
         )
 
         result = await db.execute(stmt)
@@ -94,49 +177,49 @@ class QuestionSearchService:
         # Выполняем первый этап поиска с оригинальным и транслитерированным запросом
         queries_to_search = [normalized_query, transliterated_query]
 
-        stmt = select(Question)
-        result = await db.execute(stmt)
-        questions = result.scalars().all()
-
-        question_map = {q: normalize(f"{q.text} {q.answer}") for q in questions}
-        matches = []
-
-        # Проводим поиск для каждого варианта запроса (оригинал и транслитерация)
-        for search_query in queries_to_search:
-            matches.extend([
-                (match[0], match[1], match[2], search_query)  # Добавляем сам запрос для отслеживания
-                for match in process.extract(
-                    search_query,
-                    question_map,
-                    scorer=fuzz.partial_ratio,
-                    score_cutoff=threshold,
-                    limit=top_n
-                )
-            ])
+        if not question_search_index.loaded:
+            await question_search_index.load(db)
 
-        if not matches:
+        # Один матричный проход по корпусу для всех вариантов запроса, вне event loop
+        unique_matches = await asyncio.to_thread(
+            question_search_index.search,
+            question_search_index.snapshot(),
+            list(dict.fromkeys(queries_to_search)),
+            threshold,
+            top_n,
+        )
+
+        if not unique_matches:
             return []
 
-        # Убираем дубли и продолжаем обработку совпадений
-        unique_matches = {match[2].id: match for match in matches}.values()
+        # Подвопросы всех совпадений загружаются одним запросом IN (...) через selectinload
+        result = await db.execute(
+            select(Question)
+            .options(selectinload(Question.sub_questions))
+            .where(Question.id.in_([match[0] for match in unique_matches]))
+        )
+        questions = {question.id: question for question in result.scalars().all()}
         response = []
 
         for match in unique_matches:
-            question = match[2]
+            question = questions.get(match[0])
+            indexed_question = question_search_index.get(match[0])
+            if question is None or indexed_question is None:
+                continue
             match_score = match[1]
-            used_query = match[3]  # Запрос, который сработал
+            used_query = match[2]  # Запрос, который сработал
 
             match_positions = []
             # Для корректных позиций используем тот запрос, который привел к совпадению
-            match_position_text = find_best_match_positions(normalize(question.text), used_query, "text")
+            match_position_text = find_best_match_positions(indexed_question.text, used_query, "text")
             if match_position_text:
                 match_positions.append(match_position_text)
 
-            match_position_answer = find_best_match_positions(normalize(question.answer), used_query, "answer")
+            match_position_answer = find_best_match_positions(indexed_question.answer, used_query, "answer")
             if match_position_answer:
                 match_positions.append(match_position_answer)
 
-            sub_questions = await get_sub_questions_for_question_from_search(db, parent_question_id=question.id)
+            sub_questions = build_sub_question_responses(question.sub_questions)
 
             question_response = QuestionSearchResponse(
                 id=question.id,
@@ -151,7 +234,7 @@ class QuestionSearchService:
                 subcategory_id=question.subcategory_id,
                 number=question.number,
                 depth=question.depth,
-                sub_questions=build_subquestions_hierarchy_from_search(sub_questions)
+                sub_questions=build_subquestions_hierarchy(sub_questions)
             )
 
             response.append(question_response)
@@ -205,68 +288,3 @@ class QuestionSearchService:
     #         for match in top_matches if match[1]
     #     ]
 
-
-async def build_question_response_from_search(question: Question,
-                                              db: AsyncSession
-                                              ) -> QuestionResponse:
-    response = QuestionResponse(
-        id=question.id,
-        text=question.text,
-        author=question.author,
-        author_edit=question.author_edit,
-        answer=question.answer,
-        number=question.number,
-        count=question.count,
-        depth=question.depth,
-        created_at=question.created_at,
-        updated_at=question.updated_at,
-        parent_question_id=question.parent_question_id,
-        category_id=question.category_id,
-        subcategory_id=question.subcategory_id,
-        sub_questions=[]
-    )
-
-    sub_questions = await get_sub_questions_for_question_from_search(db, parent_question_id=question.id)
-
-    response.sub_questions = build_subquestions_hierarchy_from_search(sub_questions)
-
-    return response
-
-
-async def get_sub_questions_for_question_from_search(db: AsyncSession, parent_question_id: int) -> List[
-    SubQuestionResponse]:
-    result = await db.execute(select(SubQuestion).where(SubQuestion.parent_question_id == parent_question_id))
-    sub_questions = result.scalars().all()
-
-    sub_question_responses = [
-        SubQuestionResponse(
-            id=sub_question.id,
-            text=sub_question.text,
-            answer=sub_question.answer,
-            number=sub_question.number,
-            count=sub_question.count,
-            parent_question_id=sub_question.parent_question_id,
-            depth=sub_question.depth,
-            category_id=sub_question.category_id,
-            subcategory_id=sub_question.subcategory_id,
-            author=sub_question.author,
-            author_edit=sub_question.author_edit,
-            created_at=sub_question.created_at,
-            updated_at=sub_question.updated_at,
-            parent_subquestion_id=sub_question.parent_subquestion_id,
-            sub_questions=[]
-        )
-        for sub_question in sub_questions
-    ]
-
-    return sub_question_responses
-
-
-def build_subquestions_hierarchy_from_search(sub_questions, parent_question_id=None):
-    hierarchy = []
-    for sub_question in sub_questions:
-        if sub_question.parent_subquestion_id == parent_question_id:
-            sub_question.sub_questions = build_subquestions_hierarchy_from_search(sub_questions, sub_question.id)
-            hierarchy.append(sub_question)
-    return hierarchy
-
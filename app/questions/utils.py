@@ -1,4 +1,5 @@
 import json
+import re
 from typing import List
 from pydantic_core._pydantic_core import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -12,6 +13,10 @@ from app.questions.schemas import QuestionCreate, UpdateCategoryData, CategoryRe
 from fastapi import HTTPException
 
 
+def normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text.strip().lower())
+
+
 async def fetch_parent_category(db: AsyncSession, parent_id: int) -> Category:
     query = select(Category).where(Category.id == parent_id)
     result = await db.execute(query)
@@ -0,0 +1,93 @@
+import asyncio
+from typing import Dict, Optional
+from sqlalchemy import update, values, column, Integer, func
+from app.config import settings
+from app.database import async_session_maker
+from app.logger.logger import logger
+from app.questions.models import Question
+
+# Не более 2 параметров на строку при лимите asyncpg в 32767 параметров на запрос
+FLUSH_CHUNK_SIZE = 5000
+
+
+class QuestionViewCounter:
+    """Накопитель просмотров вопросов.
+
+    Просмотры суммируются в памяти процесса и периодически записываются одним
+    UPDATE ... FROM (VALUES ...) с count = count + delta, поэтому чтение вопроса
+    не делает commit и не блокирует строку. При ошибке записи приращения
+    возвращаются в буфер, при остановке приложения буфер сбрасывается в БД.
+    """
+
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._pending: Dict[int, int] = {}
+        self._in_flight: Dict[int, int] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def increment(self, question_id: int, delta: int = 1):
+        self._pending[question_id] = self._pending.get(question_id, 0) + delta
+
+    def pending(self, question_id: int) -> int:
+        """Просмотры, еще не записанные в БД (включая записываемые сейчас)"""
+        return self._pending.get(question_id, 0) + self._in_flight.get(question_id, 0)
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._pending:
+                return
+
+            self._in_flight, self._pending = self._pending, {}
+            deltas = list(self._in_flight.items())
+
+            try:
+                async with async_session_maker() as session:
+                    for start in range(0, len(deltas), FLUSH_CHUNK_SIZE):
+                        view_deltas = values(
+                            column("id", Integer),
+                            column("delta", Integer),
+                            name="view_deltas",
+                        ).data(deltas[start:start + FLUSH_CHUNK_SIZE])
+
+                        await session.execute(
+                            update(Question)
+                            .where(Question.id == view_deltas.c.id)
+                            .values(
+                                count=func.coalesce(Question.count, 0) + view_deltas.c.delta,
+                                # Просмотр не является редактированием вопроса
+                                updated_at=Question.updated_at,
+                            )
+                            .execution_options(synchronize_session=False)
+                        )
+                    await session.commit()
+            except Exception as e:
+                logger.warning(f"Не удалось записать счетчики просмотров, повтор при следующем сбросе: {e}")
+                for question_id, delta in deltas:
+                    self.increment(question_id, delta)
+            finally:
+                self._in_flight = {}
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            # Отмена под блокировкой не прерывает уже начатую запись приращений
+            async with self._flush_lock:
+                self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+question_view_counter = QuestionViewCounter(flush_interval=settings.VIEW_COUNTER_FLUSH_INTERVAL)
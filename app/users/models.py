@@ -53,3 +53,15 @@ class Permissions(Base):
 
     # Связь с таблицей Roles (one-to-many)
     role: Mapped[Roles] = relationship('Roles', back_populates='permissions')
+
+
+class UserTokenVersion(Base):
+    """Версия токенов пользователя: увеличивается при изменении пользователя или его ролей.
+
+    Токены с меньшей версией (claim ver) больше не считаются источником ролей.
+    Строка не удаляется вместе с пользователем, чтобы его токены оставались отозванными.
+    """
+    __tablename__ = "user_token_versions"
+
+    user_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, status, Depends
-from app.auth.auth import pwd_context
+from app.auth.auth import get_password_hash
+from app.dao.base import unit_of_work
 from app.dao.dao import UsersDAO
 from app.dao.dependencies import get_current_user
 from app.logger.logger import logger
@@ -33,30 +34,32 @@ async def update_user(
     """Обновление информации о пользователе"""
     users_dao = UsersDAO()
 
-    if update_data.username:
-        existing_user = await users_dao.find_one_or_none(username=update_data.username)
-        if existing_user and existing_user.id != current_user.id:
-            logger.warning(f"Имя пользователя {update_data.username} уже используется.")
-            raise UserNameAlreadyExistsException
-
-    if update_data.email:
-        existing_user = await users_dao.find_one_or_none(email=update_data.email)
-        if existing_user and existing_user.id != current_user.id:
-            logger.warning(f"Email {update_data.email} уже используется.")
-            raise UserEmailAlreadyExistsException
-
-    hashed_password = pwd_context.hash(update_data.password) if update_data.password else None
-
-    try:
-        await users_dao.update(
-            model_id=current_user.id,
-            username=update_data.username,
-            email=update_data.email,
-            hashed_password=hashed_password,
-            firstname=update_data.firstname,
-        )
-    except Exception as e:
-        logger.warning(f"Ошибка обновления пользователя: {e}")
-        raise ErrorUpdatingUser
+    hashed_password = await get_password_hash(update_data.password) if update_data.password else None
+
+    async with unit_of_work() as session:
+        if update_data.username:
+            existing_user = await users_dao.find_one_or_none(username=update_data.username, session=session)
+            if existing_user and existing_user.id != current_user.id:
+                logger.warning(f"Имя пользователя {update_data.username} уже используется.")
+                raise UserNameAlreadyExistsException
+
+        if update_data.email:
+            existing_user = await users_dao.find_one_or_none(email=update_data.email, session=session)
+            if existing_user and existing_user.id != current_user.id:
+                logger.warning(f"Email {update_data.email} уже используется.")
+                raise UserEmailAlreadyExistsException
+
+        try:
+            await users_dao.update(
+                model_id=current_user.id,
+                username=update_data.username,
+                email=update_data.email,
+                hashed_password=hashed_password,
+                firstname=update_data.firstname,
+                session=session,
+            )
+        except Exception as e:
+            logger.warning(f"Ошибка обновления пользователя: {e}")
+            raise ErrorUpdatingUser
 
     return UpdateUser
@@ -1,6 +1,6 @@
 from fastapi import HTTPException
 from fastapi_mail import ConnectionConfig, MessageSchema, FastMail
-from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from app.config import settings
 from app.database import async_session_maker
 from app.logger.logger import logger
@@ -8,18 +8,17 @@ from app.users.models import Roles
 from aiosmtplib.errors import SMTPException
 
 
-async def init_roles():
-    async with async_session_maker() as session:
-        roles = ["user", "admin", "moderator"]
-
-        for role_name in roles:
-            existing_role = await session.execute(select(Roles).where(Roles.name == role_name))
-            existing_role = existing_role.scalar_one_or_none()
+DEFAULT_ROLES = ["user", "admin", "moderator"]
 
-            if not existing_role:
-                new_role = Roles(name=role_name)
-                session.add(new_role)
 
+async def init_roles():
+    """Создание недостающих ролей одним INSERT ... ON CONFLICT DO NOTHING"""
+    async with async_session_maker() as session:
+        await session.execute(
+            pg_insert(Roles)
+            .values([{"name": role_name} for role_name in DEFAULT_ROLES])
+            .on_conflict_do_nothing(index_elements=[Roles.name])
+        )
         await session.commit()
 
 
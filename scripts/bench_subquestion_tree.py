@@ -0,0 +1,101 @@
+"""Сравнение сборки дерева подвопросов: прежний рекурсивный алгоритм и build_subquestions_hierarchy.
+
+Запуск из корня репозитория:
+
+    python scripts/bench_subquestion_tree.py
+    python scripts/bench_subquestion_tree.py --sizes 100 400 1600 --deep 3200
+
+Дерево случайное: родитель каждого узла - один из пяти предыдущих узлов.
+Время - лучшее из --repeat запусков.
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.questions.dao_queestion import build_subquestions_hierarchy  # noqa: E402
+from app.questions.schemas import SubQuestionResponse  # noqa: E402
+
+
+def build_hierarchy_old(sub_questions, parent_question_id=None):
+    """Прежняя реализация: полный проход по списку на каждый узел, O(n^2), с рекурсией"""
+    hierarchy = []
+    for sub_question in sub_questions:
+        if sub_question.parent_subquestion_id == parent_question_id:
+            sub_question.sub_questions = build_hierarchy_old(sub_questions, sub_question.id)
+            hierarchy.append(sub_question)
+    return hierarchy
+
+
+def make_sub_questions(n: int):
+    sub_questions = []
+    for i in range(1, n + 1):
+        parent = None if i <= 3 else random.randint(max(1, i - 5), i - 1)
+        sub_questions.append(SubQuestionResponse(
+            id=i, text="text", number=i, parent_question_id=1, depth=1, parent_subquestion_id=parent
+        ))
+    return sub_questions
+
+
+def count_nodes(tree) -> int:
+    stack, count = list(tree), 0
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.sub_questions)
+    return count
+
+
+def copies(sub_questions):
+    # Прежняя реализация изменяет переданные объекты
+    return [sub_question.model_copy(update={"sub_questions": []}) for sub_question in sub_questions]
+
+
+def compare(n: int, repeat: int):
+    sub_questions = make_sub_questions(n)
+
+    old_time = min(timeit.repeat(lambda: build_hierarchy_old(copies(sub_questions)), number=1, repeat=repeat))
+    new_time = min(timeit.repeat(lambda: build_subquestions_hierarchy(sub_questions), number=1, repeat=repeat))
+
+    old_tree = build_hierarchy_old(copies(sub_questions))
+    new_tree = build_subquestions_hierarchy(sub_questions)
+    assert count_nodes(old_tree) == count_nodes(new_tree) == n
+    assert all(sub_question.sub_questions == [] for sub_question in sub_questions)
+
+    print(f"n={n}: old {old_time * 1000:.1f} ms, new {new_time * 1000:.1f} ms")
+
+
+def compare_deep(n: int):
+    sub_questions = make_sub_questions(n)
+
+    try:
+        build_hierarchy_old(copies(sub_questions))
+        old_result = "ok"
+    except RecursionError:
+        old_result = "RecursionError"
+
+    new_tree = build_subquestions_hierarchy(sub_questions)
+    assert count_nodes(new_tree) == n
+
+    print(f"n={n}: old {old_result}, new ok")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 400, 1600])
+    parser.add_argument("--deep", type=int, default=3200, help="размер дерева для проверки глубокой рекурсии")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    for n in args.sizes:
+        compare(n, args.repeat)
+    compare_deep(args.deep)
+
+
+if __name__ == "__main__":
+    main()